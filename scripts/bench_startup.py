@@ -0,0 +1,74 @@
+"""Measure cold-start time of the CLI and the modules it loads, in fresh interpreters.
+
+Each case runs in a new python process from a temporary working directory, so
+the numbers include imports and config loading and catch cwd-relative paths.
+With --record the medians are appended to a JSON lines history, and
+--max-regression fails the run when a case is slower than its last record.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+CASES = {
+    'cli_help': [str(SRC_DIR / 'UpdatePositionCSVs.py'), '--help'],
+    'import_update': ['-c', 'import UpdatePositionCSVs'],
+    'import_plot': ['-c', 'import PlotPositions'],
+    'import_web': ['-c', 'import web_interface'],
+}
+
+def time_case(args, runs, cwd):
+    """Return the wall times in seconds of runs fresh interpreters running args"""
+    env = {'PYTHONPATH': str(SRC_DIR), 'PYTHONDONTWRITEBYTECODE': '1', 'PATH': ''}
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def last_record(history):
+    if not history.exists():
+        return None
+    lines = history.read_text().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark CLI cold-start time')
+    parser.add_argument('--runs', type=int, default=5, help='Interpreter launches per case')
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help='Cases to run (default all)')
+    parser.add_argument('--record', default=None, help='Append the results to this JSON lines history file')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='Exit non-zero when a median is this fraction slower than the last record, e.g. 0.2')
+    args = parser.parse_args()
+
+    previous = last_record(Path(args.record)) if args.record else None
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        for name in args.case or sorted(CASES):
+            times = time_case(CASES[name], args.runs, cwd)
+            results[name] = round(statistics.median(times), 4)
+            line = f"{name:<14} median {results[name]:.3f}s  min {min(times):.3f}s"
+            if previous and name in previous['median_seconds']:
+                line += f"  last {previous['median_seconds'][name]:.3f}s"
+            print(line)
+
+    if args.record:
+        record = {'date': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                  'runs': args.runs, 'median_seconds': results}
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    if args.max_regression is not None and previous:
+        slower = [name for name, seconds in results.items()
+                  if name in previous['median_seconds'] and seconds > previous['median_seconds'][name] * (1 + args.max_regression)]
+        if slower:
+            sys.exit(f"Startup regression in {', '.join(slower)}")
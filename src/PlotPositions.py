@@ -1,4 +1,4 @@
-import matplotlib.pyplot as plt
+import logging
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
@@ -6,59 +6,295 @@ import io
 import base64
 import webbrowser
 import os  # Added for file path handling
-import json
+import re
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from importlib.metadata import version
 import numpy as np
+from config_loader import load_config
+from figure_cache import figure_key, update_digest
+from interactive_report import build_payload, write_interactive_report
+from report_writer import ReportWriter
+from plot_data import SMALL_POSITION_PCT, current_values, allocation_split, ticker_groups
+from risk import portfolio_risk
 
-with open('config/visualization.json', 'r') as f:
-    plotting_config = json.load(f)
+logger = logging.getLogger(__name__)
+
+# bump when a plot method changes how it draws, so cached figures are re-rendered
+PLOT_VERSION = 2
+
+# 'inline' embeds base64 PNGs in plots.html, the others write image files next to it
+IMAGE_FORMATS = ('inline', 'png', 'webp', 'svg')
+# 'matplotlib' renders figures server side, 'interactive' writes a JSON payload drawn by a browser viewer
+BACKENDS = ('matplotlib', 'interactive')
+IMAGES_DIR = 'images'
+IMAGE_SRC = re.compile(r'src="' + IMAGES_DIR + r'/([^"]+)"')
+# first line of every stored section, so a section is only reused with the image format it was drawn for
+SECTION_HEADER = '<!-- image_format={} -->\n'
+
+# expiry buckets for report_expiring_options: (end day, html title, csv label); a bucket
+# covers days to expiry from the previous bucket's end (0 for the first) up to its own end
+EXPIRY_BUCKETS = [
+    (1, 'Expiring Today', 'Today'),
+    (7, '...7 DTE', 'Less Than a Week'),
+    (30, '...30 DTE', 'Less Than a Month'),
+    (45, '..45 DTE', 'Less Than 45 Days'),
+    (90, '...90 DTE', 'Less Than a Quarter'),
+]
+
+# per-ticker figure templates, built once per process, kind and visualization config: {kind: (config, template)}
+TEMPLATES = {}
+
+def figure_template(kind):
+    """Return this process's template for 'exposure' or 'expirations', building it on first use"""
+    plotting_config = load_config('visualization')
+    # load_config returns a new object once the file changes, so an edited config rebuilds the template
+    if kind not in TEMPLATES or TEMPLATES[kind][0] is not plotting_config:
+        from figure_templates import ExposureTemplate, ExpirationsTemplate  # imports matplotlib
+        if kind == 'exposure':
+            types = list(plotting_config["option_type_codes"].keys())
+            template = ExposureTemplate(types, [plotting_config["option_colors"][t] for t in types])
+        else:
+            template = ExpirationsTemplate()
+        TEMPLATES[kind] = (plotting_config, template)
+    return TEMPLATES[kind][1]
+
+def use_agg_backend():
+    """Process pool initializer: render figures off-screen in workers"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+@lru_cache(maxsize=None)
+def matplotlib_version():
+    """Installed matplotlib version, read without importing matplotlib"""
+    return version('matplotlib')
+
+def section_name(ticker):
+    """File-safe name for a ticker's report sections"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(ticker))
 
 class PlotPositions:
-    def __init__(self, input_dir, output_dir):
+    def __init__(self, input_dir, output_dir, workers=1, figure_cache=None, image_format='inline', backend='matplotlib',
+                 risk_workers=1, risk=True):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format {image_format}; expected one of {IMAGE_FORMATS}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown plot backend {backend}; expected one of {BACKENDS}")
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.image_format = image_format
+        self.backend = backend
+        self.images_dir = self.output_dir / IMAGES_DIR
+        # processes used to render figures; 1 renders in this process
+        self.workers = workers
+        # optional FigureCache shared across runs and output directories
+        self.figure_cache = figure_cache
+        # processes used for the Monte Carlo batches of the risk section; 1 simulates in this process
+        self.risk_workers = risk_workers
+        # whether the report has the shock grid and Monte Carlo VaR section
+        self.risk = risk
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # rendered report sections, reused by incremental runs
+        self.sections_dir = self.output_dir / 'sections'
+        self.sections_dir.mkdir(exist_ok=True)
 
-    def plot_all(self, stocks_df, options_df):
-        html_parts = ['<html><body>']
-        
-        # Generate and append each plot as base64 image
-        img_base64 = self.plot_current_value(stocks_df, options_df)
-        html_parts.extend(img_base64)
-        
-        #img_base64 = self.plot_gain_loss(stocks_df, options_df)
-        #html_parts.extend(img_base64)
-        
-        img_base64 = self.plot_pie_allocation(stocks_df, options_df)
-        html_parts.extend(img_base64)
-        
-        img_base64 = self.plot_options_exposure_per_ticker(options_df)
-        html_parts.extend(img_base64)
-        
-        html_parts.append('</body></html>')
-        html_content = ''.join(html_parts)
-        
-        # Save to a temporary HTML file and open it
+    def plot_all(self, stocks_df, options_df, changes=None):
+        """Write plots.html; with a changes dict from an incremental harmonize, unchanged sections are reused"""
+        for _ in self.iter_report(stocks_df, options_df, changes):
+            pass
         html_file_path = self.output_dir / 'plots.html'
-        with open(html_file_path, 'w') as f:
-            f.write(html_content)
         
         # Open in web browser using file URI
         webbrowser.open('file://' + os.path.realpath(html_file_path))
-        print(f"Opened plots in web browser from file: {html_file_path}")
+        logger.info(f"Opened plots in web browser from file: {html_file_path}")
+
+    def iter_report(self, stocks_df, options_df, changes=None):
+        """Write plots.html section by section, yielding each section's html once it is flushed to the file.
+
+        Only the section being written is held in memory, so the sections can be
+        streamed on (e.g. in an HTTP response) while the file is written. If a
+        previous run for the same positions stopped part way, the sections it
+        completed are reused rather than rendered again.
+        """
+        html_file_path = self.output_dir / 'plots.html'
+        if self.backend == 'interactive':
+            # serializing the chart data is cheap, so the whole payload is rebuilt every run
+            payload = build_payload(stocks_df, options_df, load_config('visualization'))
+            yield write_interactive_report(payload, self.output_dir).read_text()
+            return
+
+        stocks_unchanged = changes is not None and changes['stocks'].empty
+        reuse_tickers = set()
+        if changes is not None:
+            reuse_tickers = set(options_df['ticker'].astype(str)) - changes['options'].tickers
+
+        writer = ReportWriter(html_file_path, self.report_fingerprint(stocks_df, options_df))
+        if writer.completed:
+            logger.info(f"Resuming report with {len(writer.completed)} completed sections")
+
+        # Generate and append each plot as base64 image
+        sections = [
+            ('current_value', stocks_unchanged, partial(self.plot_current_value, stocks_df)),
+            #('gain_loss', stocks_unchanged, partial(self.plot_gain_loss, stocks_df, options_df)),
+            ('pie_allocation', stocks_unchanged, partial(self.plot_pie_allocation, stocks_df)),
+        ]
+        if self.risk:
+            # risk depends on the time left to each expiration, so the date is part of its cache key
+            sections.append(('risk', False, partial(self.plot_risk, stocks_df, options_df, datetime.now().strftime('%Y-%m-%d'))))
+        sections.extend(self.ticker_sections(options_df, reuse_tickers))
+        sections = [(name, reuse or name in writer.completed, render) for name, reuse, render in sections]
+
+        referenced_images = set()
+        with writer:
+            for name, html in self.iter_sections(sections):
+                writer.write_section(name, html)
+                referenced_images.update(IMAGE_SRC.findall(html))
+                yield html
+        if self.image_format != 'inline':
+            self.prune_images(referenced_images)
+
+    def report_fingerprint(self, stocks_df, options_df):
+        """Hash of everything the figure sections depend on, to tell whether a partial report can be resumed"""
+        digest = hashlib.sha256()
+        for value in (stocks_df, options_df, PLOT_VERSION, self.image_format, datetime.now().strftime('%Y%m%d')):
+            update_digest(digest, value)
+        return digest.hexdigest()
+
+    def reuse_or_render(self, sections):
+        """Return the html of (name, reuse, render) report sections in order"""
+        return [html for _, html in self.iter_sections(sections)]
+
+    def iter_sections(self, sections):
+        """Yield (name, html) for (name, reuse, render) report sections in order, as each becomes ready.
+
+        A section with reuse set is read from its stored file when present and drawn
+        for the current image_format, then the figure cache is tried; the rest are
+        rendered and stored. render is a functools.partial returning an html string
+        or a list of them. With workers > 1 renders run in a process pool, at most a
+        few per worker ahead of the section being yielded, so memory stays bounded
+        by that window.
+        """
+        pool = None
+        ahead = 1
+        if self.workers != 1 and len(sections) > 1:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=use_agg_backend)
+            ahead = 2 * (self.workers or os.cpu_count())
+        window = deque()
+        counts = {'hits': 0, 'rendered': 0}
+        try:
+            for name, reuse, render in sections:
+                key, html = self.stored_section(name, reuse, render, counts)
+                if html is None:
+                    counts['rendered'] += 1
+                    result = pool.submit(render) if pool is not None else render()
+                    window.append((name, key, result, True))
+                else:
+                    window.append((name, None, html, False))
+                if len(window) >= ahead:
+                    yield self.finish_section(*window.popleft())
+            while window:
+                yield self.finish_section(*window.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        if self.figure_cache is not None:
+            logger.info(f"Figure cache: {counts['hits']} hits, {counts['rendered']} rendered")
+
+    def stored_section(self, name, reuse, render, counts):
+        """Return (figure cache key, html) with html None unless the section is stored or cached"""
+        if reuse:
+            html = self.load_section(name)
+            if html is not None:
+                return None, html
+        if self.figure_cache is None:
+            return None, None
+        key = figure_key(render, load_config('visualization'), PLOT_VERSION, matplotlib_version(), self.image_format)
+        html = self.figure_cache.read(key)
+        # a cached section written for another output directory lacks its image files here
+        if html is not None and all((self.images_dir / src).exists() for src in IMAGE_SRC.findall(html)):
+            counts['hits'] += 1
+            self.store_section(name, html)
+            return None, html
+        return key, None
+
+    def finish_section(self, name, key, result, rendered):
+        """Return (name, html); a rendered result (or its future) is resolved, stored and cached under key"""
+        if not rendered:
+            return name, result
+        if not isinstance(result, (str, list)):
+            result = result.result()
+        html = result if isinstance(result, str) else ''.join(result)
+        self.store_section(name, html)
+        if key is not None:
+            self.figure_cache.write(key, html)
+        return name, html
+
+    def load_section(self, name):
+        """Stored html of a section, or None when it is missing or was drawn for another image format"""
+        try:
+            header, _, html = (self.sections_dir / f'{name}.html').read_text().partition('\n')
+        except OSError:
+            return None
+        return html if header + '\n' == SECTION_HEADER.format(self.image_format) else None
+
+    def store_section(self, name, html):
+        (self.sections_dir / f'{name}.html').write_text(SECTION_HEADER.format(self.image_format) + html)
 
     def get_base64_image(self, fig):
+        """Return an img tag for fig and close it"""
+        import matplotlib.pyplot as plt
+        img = self.image_tag(fig)
+        plt.close(fig)  # Close figure to free memory
+        return img
+
+    def image_tag(self, fig, tight=True):
+        """Return an img tag for fig; an inline base64 PNG unless image_format names a file type.
+
+        tight crops the saved image to its contents, at the cost of an extra draw;
+        figures with a fixed layout pass tight=False.
+        """
+        if self.image_format != 'inline':
+            return self.save_image(fig, tight)
         buf = io.BytesIO()
-        fig.savefig(buf, format='png', bbox_inches='tight')
+        fig.savefig(buf, format='png', bbox_inches='tight' if tight else None)
         buf.seek(0)
         img_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close(fig)  # Close figure to free memory
         return f'<img src="data:image/png;base64,{img_base64}">'
 
-    def plot_current_value(self, stocks_df, options_df):
+    def save_image(self, fig, tight=True):
+        """Write fig to images/ under its content hash and return a lazy-loading img tag with its pixel size"""
+        buf = io.BytesIO()
+        fig.savefig(buf, format=self.image_format, bbox_inches='tight' if tight else None)
+        data = buf.getvalue()
+        if self.image_format == 'svg':
+            # svg sizes are in points; browsers draw them at 96 px per 72 pt
+            size = re.search(rb'<svg[^>]*width="([\d.]+)pt" height="([\d.]+)pt"', data)
+            width, height = (round(float(value) * 96 / 72) for value in size.groups())
+        else:
+            from PIL import Image  # installed with matplotlib
+            width, height = Image.open(io.BytesIO(data)).size
+
+        name = f'{hashlib.sha256(data).hexdigest()[:16]}.{self.image_format}'
+        self.images_dir.mkdir(exist_ok=True)
+        path = self.images_dir / name
+        if not path.exists():
+            path.write_bytes(data)
+        return f'<img src="{IMAGES_DIR}/{name}" loading="lazy" decoding="async" width="{width}" height="{height}">'
+
+    def prune_images(self, referenced):
+        """Delete image files other than the referenced names"""
+        for path in self.images_dir.glob('*'):
+            if path.name not in referenced:
+                path.unlink()
+
+    def plot_current_value(self, stocks_df):
+        import matplotlib.pyplot as plt  # imported on first render, it is slow to load
         images = []
         
         # Stocks current value bar plots - regular and log scale
-        sorted_stocks = stocks_df.sort_values('current value', ascending=False)
+        sorted_stocks = current_values(stocks_df)
         
         # Create figure with two subplots stacked vertically, sharing 
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
@@ -84,22 +320,10 @@ class PlotPositions:
         plt.tight_layout()
         images.append('<h2>Current Value by Stock Position</h2>' + self.get_base64_image(fig))
         
-        # Options current value bar plot
-        if not options_df.empty and False:
-            options_df['label'] = options_df['ticker'] + ' ' + options_df['strike'].astype(str) + ' ' + options_df['options_type'] + ' ' + options_df['expiration']
-            sorted_options = options_df.sort_values('current value', ascending=False)
-            fig, ax = plt.subplots(figsize=(12, 6))
-            ax.bar(sorted_options['label'], sorted_options['current value'], edgecolor='black', facecolor='none')
-            ax.set_title('Current Value by Options Position')
-            ax.set_xlabel('Option Label', fontsize=16)
-            ax.set_ylabel('Current Value ($)', fontsize=16)
-            ax.tick_params(axis='both', labelsize=16)
-            plt.xticks(rotation=45, ha='right')
-            images.append('<h2>Current Value by Options Position</h2>' + self.get_base64_image(fig))
-        
         return images
 
     def plot_gain_loss(self, stocks_df, options_df):
+        import matplotlib.pyplot as plt  # imported on first render, it is slow to load
         images = []
         
         # Stocks gain/loss bar plot
@@ -128,29 +352,18 @@ class PlotPositions:
         
         return images
 
-    def plot_pie_allocation(self, stocks_df, options_df):
+    def plot_pie_allocation(self, stocks_df):
+        import matplotlib.pyplot as plt  # imported on first render, it is slow to load
         images = []
 
-        sm_pos_pct = 2.0  # Small position percentage threshold
+        sm_pos_pct = SMALL_POSITION_PCT  # Small position percentage threshold
         fs = 14 # Font size for pie annotations
         
-        # Pie chart: Portfolio allocation by ticker (stocks + options current value)
-        combined_allocation = pd.concat([
-            stocks_df.groupby('ticker')['current value'].sum(),
-            #options_df.groupby('ticker')['current value'].sum()
-        ], axis=1).sum(axis=1, skipna=True)
-
         # Create figure with two subplots side by side
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(20, 10))
 
-        # Calculate small positions (< 5%)
-        total_value = combined_allocation.sum()
-        small_positions = combined_allocation[combined_allocation/total_value < sm_pos_pct/100]
-        large_positions = combined_allocation[combined_allocation/total_value >= sm_pos_pct/100]
-        
-        # Add small positions as a single slice
-        if not small_positions.empty:
-            large_positions['Small Positions'] = small_positions.sum()
+        # Calculate small positions, pooled into one slice of the large positions
+        large_positions, small_positions = allocation_split(stocks_df, sm_pos_pct)
 
         # First pie chart with large positions and small positions aggregated
         num_colors = len(small_positions)
@@ -177,148 +390,115 @@ class PlotPositions:
         
         return images
 
-    def plot_options_exposure_per_ticker(self, options_df):
-        images = []
+    def plot_risk(self, stocks_df, options_df, current_date):
+        """Shock grid and Monte Carlo P&L of the whole book, with VaR/ES and a per-ticker shock table"""
+        import matplotlib.pyplot as plt  # imported on first render, it is slow to load
+        risk = portfolio_risk(stocks_df, options_df, current_date=current_date, workers=self.risk_workers)
+        grid, mc = risk['shock_grid'], risk['monte_carlo']
+
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+        for shift in grid.columns:
+            ax1.plot(grid.index * 100, grid[shift], marker='o', label=f'vol {shift * 100:+.0f} pts')
+        ax1.axhline(0, color='black', linewidth=0.8)
+        ax1.set_title('P&L with Every Underlying Shocked')
+        ax1.set_xlabel('Underlying Move (%)')
+        ax1.set_ylabel('P&L ($)')
+        ax1.grid(True, linestyle='--', linewidth=0.5)
+        ax1.legend()
+
+        ax2.hist(mc.pnl, bins=100, color='lightgrey', edgecolor='grey')
+        ax2.axvline(-mc.var, color='red', label=f'VaR {mc.confidence:.0%}: ${mc.var:,.0f}')
+        ax2.axvline(-mc.expected_shortfall, color='darkred', linestyle='--', label=f'ES: ${mc.expected_shortfall:,.0f}')
+        ax2.set_title(f'Simulated {mc.horizon_days} Day P&L ({len(mc.pnl):,} paths)')
+        ax2.set_xlabel('P&L ($)')
+        ax2.set_ylabel('Paths')
+        ax2.legend()
+        plt.tight_layout()
+
+        table = risk['ticker_shocks'].rename(columns=lambda shock: f'{shock:+.0%}')
+        return ['<h2>Portfolio Risk</h2>' + self.get_base64_image(fig),
+                f'<p>{mc.horizon_days} day value at risk ({mc.confidence:.0%}): ${mc.var:,.0f}; '
+                f'expected shortfall: ${mc.expected_shortfall:,.0f}</p>',
+                '<h3>P&amp;L by Ticker When Its Underlying Moves</h3>' + table.to_html(float_format=lambda v: f'{v:,.0f}')]
+
+    def plot_options_exposure_per_ticker(self, options_df, reuse_tickers=()):
+        """Exposure and expiration figures per ticker; tickers in reuse_tickers use stored sections when present"""
+        return self.reuse_or_render(self.ticker_sections(options_df, reuse_tickers))
+
+    def ticker_sections(self, options_df, reuse_tickers=()):
+        """(name, reuse, render) entries for the exposure and expiration sections of each ticker, in ticker order"""
+        sections = []
         if options_df.empty:
-            return images
-        
-        # Option types and colors from config
-        types = list(plotting_config["option_type_codes"].keys())
-        types_colors = [plotting_config["option_colors"][t] for t in types]
-        
-        # Group by ticker
-        grouped = options_df.groupby("ticker")
+            return sections
         
         current_date = datetime.now()
 
-        for ticker, group in grouped:
-            if group.empty:
-                continue
-            
-            # Compute DTE and filter to next 90 days
-            group['expiration_date'] = pd.to_datetime(group['expiration'])
-            group['DTE'] = (group['expiration_date'] - current_date).dt.days
-            
-            if group.empty:
-                continue
-            
-            # Calculate symmetric y-limits centered on zero
-            max_abs = max(abs(group['current value'].min()), group['current value'].max()) * 1.1
-            y_limits = (-max_abs, max_abs)
-            
-            # Create subplots
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4), sharey=True)
-            
-            # 1. Exposure by Type: Bar per type, net value
-            cax = ax1
-            type_group = group.groupby("options_type")["current value"].sum().reindex(types)
-            type_group.plot(kind="bar", ax=cax, color=types_colors)
-            cax.set_title("Exposure by Type")
-            cax.set_xlabel("Option Type", fontsize=14)
-            cax.set_ylabel("Net Exposure ($)", fontsize=14)
-            cax.tick_params(axis='both', labelsize=14)
-            cax.set_ylim(y_limits)
-            # Shade negative area
-            cax.fill_between(cax.get_xlim(), y_limits[0], 0, color='lightblue', alpha=0.3)
-
-            # 2. Strike Ladder: Bar by strike, value per type
-            cax = ax2
-            strike_group = group.groupby(["strike", "options_type"])["current value"].sum().unstack(fill_value=0)
-            strike_group = strike_group.reindex(columns=types)
-            strike_group = strike_group.sort_index()
-            strike_group.plot(kind="bar", ax=cax, color=types_colors, legend=False)
-            cax.set_title("Strike Ladder")
-            cax.set_xlabel("Strike Price", fontsize=14)
-            cax.set_ylabel("", fontsize=14)  # Remove y-label for right plot
-            cax.tick_params(axis='both', labelsize=14)
-            cax.tick_params(axis='x', rotation=0)
-            cax.set_ylim(y_limits)
-            # Shade negative area
-            cax.fill_between(cax.get_xlim(), y_limits[0], 0, color='lightblue', alpha=0.3)
-
-            # Tight layout for better spacing
-            plt.tight_layout()
-            images.append(f"<h2>{ticker}</h2>" + self.get_base64_image(fig))
-
-            # Create subplots
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4), sharey=True)
-            # 1. Expiration DTE Prices: Scatter plot of expirations
-
-            cax = ax1
-            st_group = group[group['DTE'] < 60]
-            cax.scatter(st_group['DTE'], st_group['strike'], c='red', alpha=0.3, marker='o', s=100)
-
-            cax.set_title("Expiration Prices")
-            cax.set_xlabel("Days to Expiration", fontsize=14)
-            cax.set_ylabel("Strike", fontsize=14)
-            cax.tick_params(axis='both', labelsize=14)
-            cax.tick_params(axis='x', rotation=90)
-            cax.grid(True, linestyle='--', alpha=0.7)
-            # Set specific x-ticks
-            xticks = np.linspace(0, 60, num=10, dtype=int)
-            cax.set_xticks(xticks)
-            cax.set_xticklabels(xticks)
-
-            cax = ax2
-            lt_group = group[group['DTE'] >= 60]
-            cax.scatter(lt_group['DTE'], lt_group['strike'], c='blue', alpha=0.3, marker='o', s=100)
-            cax.set_title("Expiration Prices")
-            cax.set_xlabel("Days to Expiration", fontsize=14)
-            cax.set_ylabel("Strike", fontsize=14)
-            cax.tick_params(axis='both', labelsize=14)
-            cax.tick_params(axis='x', rotation=90)
-            cax.grid(True, linestyle='--', alpha=0.7)
-            # Set specific x-ticks
-            xticks = [60, 90, 120, 180, 270, 360, 540, 720]
-            cax.set_xticks(xticks)
-            cax.set_xticklabels(xticks)
-
-            # Tight layout for better spacing
-            plt.tight_layout()
-            images.append(self.get_base64_image(fig))
+        # Group by ticker, with DTE computed per group
+        for ticker, group in ticker_groups(options_df, current_date):
+            # the expiration figure depends on today's date, so its stored section is dated
+            name = section_name(ticker)
+            reuse = ticker in reuse_tickers
+            sections.append((f'exposure_{name}', reuse, partial(self.plot_ticker_exposure, ticker, group)))
+            sections.append((f'expirations_{name}_{current_date:%Y%m%d}', reuse,
+                partial(self.plot_ticker_expirations, group)))
 
-        return images
+        # drop expiration sections rendered on earlier days
+        for path in self.sections_dir.glob('expirations_*.html'):
+            if not path.stem.endswith(f'_{current_date:%Y%m%d}'):
+                path.unlink()
+
+        return sections
+
+    def plot_ticker_exposure(self, ticker, group):
+        """Exposure by type and strike ladder bars for one ticker"""
+        fig = figure_template('exposure').render(group)
+        return f"<h2>{ticker}</h2>" + self.image_tag(fig, tight=False)
+
+    def plot_ticker_expirations(self, group):
+        """Strike vs days-to-expiration scatter for one ticker, short and long dated"""
+        fig = figure_template('expirations').render(group)
+        return self.image_tag(fig, tight=False)
 
-    def report_expiring_options(self, options_df, days_threshold=90):  # Max to cover quarter (~90 days)
+    def report_expiring_options(self, options_df, days_threshold=90, buckets=EXPIRY_BUCKETS):  # Max to cover quarter (~90 days)
+        """Return html lists of options per expiry bucket and save expiring_options.csv with a bucket column.
+
+        buckets is a list of (end day, html title, csv label) shared by both outputs;
+        buckets starting at or after days_threshold are left out. options_df is not modified.
+        """
         if options_df.empty:
             return "<p>No options positions found.</p>"
-        
+
+        starts = [0] + [end for end, _, _ in buckets[:-1]]
+        buckets = [bucket for start, bucket in zip(starts, buckets) if start < days_threshold]
+        edges = [0] + [end for end, _, _ in buckets]
+
         current_date = datetime.now()
-        options_df['expiration_date'] = pd.to_datetime(options_df['expiration'])
-        options_df['days_to_expiry'] = (options_df['expiration_date'] - current_date).dt.days
-        
-        # Filter for positive days (future expirations)
-        future_options = options_df[options_df['days_to_expiry'] >= 0]
-        
-        # Buckets
-        expiring_today = future_options[future_options['days_to_expiry'] == 0]
-        expiring_week = future_options[(future_options['days_to_expiry'] > 0) & (future_options['days_to_expiry'] < 7)]
-        expiring_month = future_options[(future_options['days_to_expiry'] >= 7) & (future_options['days_to_expiry'] < 30)]
-        expiring_45dte = future_options[(future_options['days_to_expiry'] >= 30) & (future_options['days_to_expiry'] < 45)]
-        expiring_quarter = future_options[(future_options['days_to_expiry'] >= 45) & (future_options['days_to_expiry'] < 90)]
-        
-        # Function to generate HTML list if not empty
-        def generate_html_list(df, title):
-            if df.empty:
-                return f"<h3 style='font-size: 24px;'>{title}</h3><p style='font-size: 18px;'>No options {title.lower()}.</p>"
-            html = f"<h3 style='font-size: 24px;'>{title}</h3><ul style='font-size: 18px;'>"
-            for _, row in df.sort_values('expiration_date').iterrows():
-                html += f"<li><b>{row['ticker']} {row['strike']}</b> | {row['options_type']} | {row['expiration']}</li>"
-            html += "</ul>"
-            return html
+        expiration_date = pd.to_datetime(options_df['expiration'])
+        days_to_expiry = (expiration_date - current_date).dt.days
         
+        # Filter for positive days (future expirations), bucket them and sort once
+        future_options = options_df.assign(expiration_date=expiration_date, days_to_expiry=days_to_expiry)[days_to_expiry >= 0]
+        future_options = future_options.assign(bucket=pd.cut(future_options['days_to_expiry'], bins=edges, right=False,
+                                                             labels=[label for _, _, label in buckets]))
+        future_options = future_options.sort_values('expiration_date', kind='stable')
+
+        items = ("<li><b>" + future_options['ticker'].astype(str) + " " + future_options['strike'].astype(str) + "</b> | "
+                 + future_options['options_type'].astype(str) + " | "
+                 + future_options['expiration_date'].dt.strftime('%Y-%m-%d') + "</li>")
+        bucket_items = items.groupby(future_options['bucket'], observed=True).agg(''.join)
+
         # Generate HTML for all buckets
-        html = generate_html_list(expiring_today, "Expiring Today")
-        html += generate_html_list(expiring_week, "...7 DTE")
-        html += generate_html_list(expiring_month, "...30 DTE")
-        html += generate_html_list(expiring_45dte, "..45 DTE")
-        html += generate_html_list(expiring_quarter, "...90 DTE")
+        html_parts = []
+        for _, title, label in buckets:
+            html_parts.append(f"<h3 style='font-size: 24px;'>{title}</h3>")
+            if label in bucket_items.index:
+                html_parts.append(f"<ul style='font-size: 18px;'>{bucket_items[label]}</ul>")
+            else:
+                html_parts.append(f"<p style='font-size: 18px;'>No options {title.lower()}.</p>")
+        html = ''.join(html_parts)
         
         # Save all to a single CSV with bucket column
-        future_options['bucket'] = pd.cut(future_options['days_to_expiry'],
-                                        bins=[-1, 0, 6, 29, 89],
-                                        labels=["Today", "Less Than a Week", "Less Than a Month", "Less Than a Quarter"])
         future_options.to_csv(self.output_dir / 'expiring_options.csv', index=False)
-        print(f"Saved expiring_options.csv to {self.output_dir}")
+        logger.info(f"Saved expiring_options.csv to {self.output_dir}")
         
-        return html
\ No newline at end of file
+        return html
@@ -1,191 +1,296 @@
+import logging
 import pandas as pd
 from pathlib import Path
 import argparse
 import re  # For parsing option symbols
-from fidelity_utils import FidelityParser
-from tastytrade_utils import TastytradeParser
+from concurrent.futures import ProcessPoolExecutor
+import fidelity_utils  # noqa: F401 -- registers the fidelity parser
+import tastytrade_utils  # noqa: F401 -- registers the tastytrade parser
+from parse_utils import get_parser, picklable_source, source_name
 from options_list import annotaions_from_df
-import json
-from PlotPositions import PlotPositions  # Import the plotting class
+from parse_cache import ParseCache
+from figure_cache import FigureCache
+from result_cache import ResultCache
+from snapshot_store import SnapshotStore, KINDS, LEGS
+from incremental import diff_positions, STOCK_KEYS, OPTION_KEYS
+from strategies import STORED_STRATEGY_COLUMNS, detect_strategies, process_synthetics
+from instrumentation import Instrumentation
+from position_schema import enforce_schema, STOCK_DTYPES, OPTION_DTYPES
+from config_loader import load_config, set_config_dir
 
-def harmonize_and_store(fidelity_csv_path, tastytrade_csv_path, output_format='json', output_path='harmonized_positions.json'):
+logger = logging.getLogger(__name__)
+
+def parse_broker_file(broker, source, cache=None, instrumentation=None):
+    """Parse one broker export (a path, bytes or a file object) with the registered parser.
+
+    Returns (stocks_df, options_df, stage records); the records come back explicitly
+    because this may run in a worker process.
+    """
+    instrumentation = instrumentation or Instrumentation()
+    parser_cls = get_parser(broker)
+    entry, frames = None, None
+    with instrumentation.stage('load', broker=broker, file=source_name(source)) as stage:
+        if cache is not None:
+            entry, frames = cache.lookup(parser_cls, source)
+        if frames is None:
+            parser_obj = parser_cls(source)
+            parser_obj.load()
+            stage['rows_out'] = len(parser_obj.df)
+        else:
+            stage['cached'] = True
+            stage['rows_out'] = len(frames[0]) + len(frames[1])
+    if frames is None:
+        with instrumentation.stage('format', rows_in=len(parser_obj.options_df), broker=broker) as stage:
+            frames = (parser_obj.stock_df, parser_obj.format_options_data())
+            stage['rows_out'] = len(frames[1])
+        if entry is not None:
+            cache.write(entry, *frames)
+    return frames + (instrumentation.records,)
+
+def harmonize_and_store(inputs, output_format='parquet', output_path='.', cache=None, workers=None, incremental=False,
+                        instrumentation=None):
     """
-    Harmonize positions from both brokers into a common format and store to file (JSON or CSV).
+    Harmonize positions from any number of broker files into a common format and store them
+    (parquet snapshot, CSV or JSON).
     
     Common format columns: Symbol, Quantity, Current Value, Cost Basis, Broker, Is Option, Expiration, Strike, Option Type, Position, Profit/Loss.
     
     Parameters:
-    - fidelity_csv_path: str
-    - tastytrade_csv_path: str
-    - output_format: str, 'json' or 'csv'
-    - output_path: str, file to save
+    - inputs: list of (broker, source) tuples, e.g. [('fidelity', 'positions.csv'), ('tastytrade', 'tasty.csv')];
+      a source is a csv path, the csv contents as bytes or an open file object
+    - output_format: str, 'parquet' appends a snapshot to <output_path>/snapshots,
+      'csv' or 'json' export harmonized_stocks/harmonized_options files
+    - output_path: str, output directory
+    - cache: ParseCache or None, reuse parsed broker files with unchanged content
+    - workers: int or None, size of the process pool used to parse several files at once
+    - incremental: bool, diff against the latest parquet snapshot and only recompute
+      synthetics for tickers whose legs changed
+    - instrumentation: Instrumentation or None, collects per-stage timings
     
     Returns:
-    - pd.DataFrame (harmonized data)
+    - (stocks_df, options_df, changes), where changes is None or a dict of stock and
+      option ChangeSets against the previous snapshot
     """
-
-    # parsers for each broker
-    parsers = {'fidelity': FidelityParser, 'tastytrade': TastytradeParser}
-    csvs = {'fidelity': fidelity_csv_path, 'tastytrade': tastytrade_csv_path}
-
+    instrumentation = instrumentation or Instrumentation()
     stock_list = []
     options_list = []
 
     # read the config file for renaming columns
-    with open('config/harmonization.json', 'r') as json_file:
-        config = json.load(json_file)
-    
-   # parse the fidelity data
-    for broker in ["fidelity", "tastytrade"]:
-        if broker not in config:
+    config = load_config('harmonization')
+
+    # check every broker before starting any parsing
+    for broker, _ in inputs:
+        section = get_parser(broker).CONFIG_SECTION
+        if section not in config:
             raise ValueError(f"Broker {broker} not found in config/harmonization.json")
         required_keys = ['stock_renames', 'option_renames']
         for key in required_keys:
-            if key not in config[broker]:
+            if key not in config[section]:
                 raise ValueError(f"Key {key} not found for broker {broker} in config/harmonization.json")
 
-        parser_obj = parsers[broker](csvs[broker])
-        parser_obj.load()
-        stocks_df = parser_obj.stock_df
-        options_df = parser_obj.format_options_data()
+    # parse the files, concurrently when there is more than one
+    if len(inputs) > 1 and workers != 1:
+        sources = [picklable_source(source) for _, source in inputs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(parse_broker_file, broker, source, cache, instrumentation.child())
+                       for (broker, _), source in zip(inputs, sources)]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+    else:
+        outcomes = []
+        for broker, path in inputs:
+            try:
+                outcomes.append(parse_broker_file(broker, path, cache, instrumentation.child()))
+            except Exception as e:
+                outcomes.append(e)
+
+    # combine results in input order so the output does not depend on scheduling
+    failures = []
+    for (broker, path), outcome in zip(inputs, outcomes):
+        if isinstance(outcome, Exception):
+            failures.append((broker, path, outcome))
+            continue
+        stocks_df, options_df, records = outcome
+        instrumentation.extend(records)
+        section = get_parser(broker).CONFIG_SECTION
 
         # rename to standard scheme
-        stocks_df.rename(columns=config[broker]['stock_renames'], inplace=True)
-        options_df.rename(columns=config[broker]['option_renames'], inplace=True)
+        stocks_df.rename(columns=config[section]['stock_renames'], inplace=True)
+        options_df.rename(columns=config[section]['option_renames'], inplace=True)
 
         # tag with source data
         stocks_df['broker'] = broker
         options_df['broker'] = broker
         stock_list.append(stocks_df)
         options_list.append(options_df)
-        del parser_obj, stocks_df, options_df
-
-    # combing data from all brokers
-    combined_stocks_df = pd.concat(stock_list, ignore_index=True)
-    combined_options_df = pd.concat(options_list, ignore_index=True)
-
-    # rename all to lower case columns
-    combined_stocks_df.columns = [col.lower() for col in combined_stocks_df.columns]
-    combined_options_df.columns = [col.lower() for col in combined_options_df.columns]
-
-    # add some quantifcations
-    tmp_len = combined_stocks_df.shape[0]
-    combined_stocks_df.dropna(subset=['quantity'], inplace=True)
-    diff_len = tmp_len - combined_stocks_df.shape[0]
-    if diff_len > 0:
-        print(f"Dropped {diff_len} rows with missing Quantity or Last Price")
-    combined_stocks_df['current value'] = combined_stocks_df.apply(lambda row:
-        row['last price'] * row['quantity'], axis=1)
+        del stocks_df, options_df
+
+    if failures:
+        details = '\n'.join(f"  {broker}: {source_name(path)}: {error!r}" for broker, path, error in failures)
+        logger.warning(f"Failed to parse {len(failures)} of {len(inputs)} files:\n{details}")
+    if not stock_list:
+        raise ValueError("No broker files could be parsed")
+
+    rows_in = sum(len(df) for df in stock_list + options_list)
+    with instrumentation.stage('harmonize', rows_in=rows_in) as stage:
+        # combing data from all brokers
+        combined_stocks_df = pd.concat(stock_list, ignore_index=True)
+        combined_options_df = pd.concat(options_list, ignore_index=True)
+
+        # rename all to lower case columns
+        combined_stocks_df.columns = [col.lower() for col in combined_stocks_df.columns]
+        combined_options_df.columns = [col.lower() for col in combined_options_df.columns]
+
+        # add some quantifcations
+        tmp_len = combined_stocks_df.shape[0]
+        combined_stocks_df.dropna(subset=['quantity'], inplace=True)
+        diff_len = tmp_len - combined_stocks_df.shape[0]
+        if diff_len > 0:
+            logger.info(f"Dropped {diff_len} rows with missing Quantity or Last Price")
+        combined_stocks_df['current value'] = combined_stocks_df.apply(lambda row:
+            row['last price'] * row['quantity'], axis=1)
     
-    # compute current value of optiosn from the bid
-    combined_options_df['current value'] = combined_options_df.apply(lambda row:
-        row['last price'] * 100 * row['quantity'], axis=1)
+        # compute current value of optiosn from the bid
+        combined_options_df['current value'] = combined_options_df.apply(lambda row:
+            row['last price'] * 100 * row['quantity'], axis=1)
 
-    # Compute gain/loss for both (assuming cost basis is total cost/credit)
-    combined_stocks_df['gain loss'] = combined_stocks_df['current value'] - combined_stocks_df['cost basis']
-    combined_options_df['gain loss'] = combined_options_df['current value'] - combined_options_df['cost basis']
+        # Compute gain/loss for both (assuming cost basis is total cost/credit)
+        combined_stocks_df['gain loss'] = combined_stocks_df['current value'] - combined_stocks_df['cost basis']
+        combined_options_df['gain loss'] = combined_options_df['current value'] - combined_options_df['cost basis']
     
-    # Format the current value column to 2 decimal places
-    combined_stocks_df['current value'] = combined_stocks_df['current value'].round(2)
-    combined_options_df['current value'] = combined_options_df['current value'].round(2)
-
-    # format the gaan loss column to 2 decimaal places
-    combined_stocks_df['gain loss'] = combined_stocks_df['current value'].round(2)
-    combined_options_df['gain loss'] = combined_options_df['current value'].round(2)
-
-    # Process synthetics in options
-    combined_options_df = process_synthetics(combined_options_df)
-
-    # only return the harmonized columns
-    harmonized_stock_cols = config['harmonized_stock_columns']
-    harmonized_option_cols = config['harmonized_option_columns']
-    combined_stocks_df = combined_stocks_df[harmonized_stock_cols]
-    combined_options_df = combined_options_df[harmonized_option_cols]
-
-    combined_stocks_path = Path(output_path) / Path('harmonized_stocks.csv')
-    combined_options_path = Path(output_path) / Path('harmonized_options.csv')
-    combined_stocks_df.to_csv(combined_stocks_path, index=False)
-    combined_options_df.to_csv(combined_options_path, index=False)
-
-    return combined_stocks_df, combined_options_df
-
-def process_synthetics(df):
-    """Identify synthetic longs and adjust the dataframe."""
-    df = df.copy()
-    synth_rows = []
-    groups = df.groupby(['ticker', 'expiration', 'strike'])
-    for name, group in groups:
-        lc_row = group[group['options_type'] == 'LC']
-        sp_row = group[group['options_type'] == 'SP']
-        if len(lc_row) == 0 or len(sp_row) == 0:
-            continue
-        lc_qty = lc_row['quantity'].iloc[0]
-        sp_qty = sp_row['quantity'].iloc[0]
-        if lc_qty <= 0 or sp_qty >= 0:
-            continue
-        synth_qty = min(lc_qty, -sp_qty)
-        if synth_qty <= 0:
-            continue
+        # Format the current value column to 2 decimal places
+        combined_stocks_df['current value'] = combined_stocks_df['current value'].round(2)
+        combined_options_df['current value'] = combined_options_df['current value'].round(2)
+
+        # format the gaan loss column to 2 decimaal places
+        combined_stocks_df['gain loss'] = combined_stocks_df['current value'].round(2)
+        combined_options_df['gain loss'] = combined_options_df['current value'].round(2)
+
+        # only keep the harmonized columns
+        harmonized_stock_cols = config['harmonized_stock_columns']
+        harmonized_option_cols = config['harmonized_option_columns']
+        combined_stocks_df = combined_stocks_df[harmonized_stock_cols]
+        combined_options_df = combined_options_df[harmonized_option_cols]
+
+        # enforce the typed schema for stocks and the raw legs
+        combined_stocks_df = enforce_schema(combined_stocks_df, STOCK_DTYPES, 'stocks')
+        legs_df = enforce_schema(combined_options_df, OPTION_DTYPES, 'legs')
+        stage['rows_out'] = len(combined_stocks_df) + len(legs_df)
+
+    with instrumentation.stage('synthetics', rows_in=len(legs_df)) as stage:
+        # Detect multi-leg strategies on the raw legs
+        strategies_df = detect_strategies(combined_options_df, combined_stocks_df)
+        Path(output_path).mkdir(parents=True, exist_ok=True)
+        strategies_df[STORED_STRATEGY_COLUMNS].to_csv(Path(output_path) / 'strategies.csv', index=False)
+        logger.info(f"Detected strategies: {strategies_df['strategy'].value_counts().to_dict()}")
 
-        # Unit values (positive for both)
-        unit_lc_current = lc_row['current value'].iloc[0] / lc_qty
-        unit_sp_current = sp_row['current value'].iloc[0] / sp_qty
-        unit_lc_cost = lc_row['cost basis'].iloc[0] / lc_qty
-        unit_sp_cost = sp_row['cost basis'].iloc[0] / sp_qty
-
-        # For synthetic (net for the pair)
-        synth_current = synth_qty * (unit_lc_current + (unit_sp_current * -1))
-        synth_cost = synth_qty * (unit_lc_cost + (unit_sp_cost * -1))
-        synth_gain = synth_current - synth_cost
-
-        # Create synthetic row
-        synth_row = lc_row.iloc[0].copy()
-        synth_row['options_type'] = 'SYN_LONG'
-        synth_row['quantity'] = synth_qty
-        synth_row['current value'] = synth_current
-        synth_row['cost basis'] = synth_cost
-        synth_row['gain loss'] = synth_gain
-        synth_row['last price'] = None  # Not applicable
-        synth_rows.append(synth_row)
-
-        # Adjust LC row
-        lc_idx = lc_row.index[0]
-        df.at[lc_idx, 'quantity'] -= synth_qty
-        df.at[lc_idx, 'cost basis'] -= synth_qty * unit_lc_cost
-        df.at[lc_idx, 'current value'] = df.at[lc_idx, 'last price'] * 100 * df.at[lc_idx, 'quantity']
-        df.at[lc_idx, 'gain loss'] = df.at[lc_idx, 'current value'] - df.at[lc_idx, 'cost basis']
-
-        # Adjust SP row
-        sp_idx = sp_row.index[0]
-        df.at[sp_idx, 'quantity'] += synth_qty
-        df.at[sp_idx, 'cost basis'] -= synth_qty * (unit_sp_cost * -1)
-        df.at[sp_idx, 'current value'] = df.at[sp_idx, 'last price'] * 100 * df.at[sp_idx, 'quantity']
-        df.at[sp_idx, 'gain loss'] = df.at[sp_idx, 'current value'] - df.at[sp_idx, 'cost basis']
-
-    # Remove zero-quantity rows
-    df = df[df['quantity'] != 0]
-
-    # Append synthetic rows
-    if synth_rows:
-        synth_df = pd.DataFrame(synth_rows)
-        df = pd.concat([df, synth_df], ignore_index=True)
-
-    return df
+        # Fold synthetic longs into SYN_LONG rows, only for changed tickers when incremental
+        changes = None
+        store = SnapshotStore(Path(output_path) / 'snapshots')
+        previous_stocks, previous_options, previous_legs = store.latest(KINDS + (LEGS,)) if incremental else (None, None, None)
+        if previous_legs is not None:
+            changes = {
+                'stocks': diff_positions(previous_stocks, combined_stocks_df, STOCK_KEYS),
+                'options': diff_positions(previous_legs, legs_df, OPTION_KEYS),
+            }
+            logger.info(f"Changes since last snapshot: stocks {changes['stocks'].summary()}, options {changes['options'].summary()}")
+            changed = list(changes['options'].tickers)
+            reused_options_df = previous_options[~previous_options['ticker'].astype(str).isin(changed)]
+            recomputed_df = process_synthetics(combined_options_df[combined_options_df['ticker'].isin(changed)])
+            combined_options_df = pd.concat([reused_options_df.astype(object), recomputed_df.astype(object)], ignore_index=True)
+        else:
+            combined_options_df = process_synthetics(combined_options_df)
+        combined_options_df = enforce_schema(combined_options_df, OPTION_DTYPES, 'options')
+        stage['rows_out'] = len(combined_options_df)
+
+    with instrumentation.stage('store', rows_in=len(combined_stocks_df) + len(combined_options_df)):
+        store_harmonized(combined_stocks_df, combined_options_df, output_format, output_path, legs_df=legs_df)
+
+    return combined_stocks_df, combined_options_df, changes
+
+def store_harmonized(stocks_df, options_df, output_format, output_path, legs_df=None):
+    """Store harmonized frames as a parquet snapshot or export them as csv/json files."""
+    if output_format == 'parquet':
+        SnapshotStore(Path(output_path) / 'snapshots').write(stocks_df, options_df, legs_df=legs_df)
+    elif output_format == 'csv':
+        stocks_df.to_csv(Path(output_path) / 'harmonized_stocks.csv', index=False)
+        options_df.to_csv(Path(output_path) / 'harmonized_options.csv', index=False)
+    elif output_format == 'json':
+        stocks_df.to_json(Path(output_path) / 'harmonized_stocks.json', orient='records', indent=2, date_format='iso')
+        options_df.to_json(Path(output_path) / 'harmonized_options.json', orient='records', indent=2, date_format='iso')
+    else:
+        raise ValueError(f"Unknown output format {output_format}; expected parquet, csv or json")
 
 # Example usage (replace with your file paths and desired output)
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process position data from Fidelity and Tastytrade')
-    parser.add_argument('--fidelity', required=True, help='Path to Fidelity positions CSV file')
-    parser.add_argument('--tastytrade', required=True, help='Path to Tastytrade positions CSV file') 
+    parser.add_argument('--fidelity', action='append', default=[], help='Path to Fidelity positions CSV file (repeat for several accounts)')
+    parser.add_argument('--tastytrade', action='append', default=[], help='Path to Tastytrade positions CSV file (repeat for several accounts)')
+    parser.add_argument('--input', action='append', default=[], metavar='BROKER=PATH', help='Positions CSV for any registered broker')
     parser.add_argument('--output', default='~/Desktop', help='Output file directory')
-    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='Output format')
+    parser.add_argument('--format', choices=['parquet', 'csv', 'json'], default='parquet', help='Output format: parquet snapshot store or csv/json export')
+    parser.add_argument('--workers', type=int, default=None, help='Number of processes used to parse input files')
+    parser.add_argument('--plot-workers', type=int, default=1, help='Number of processes used to render report figures (default 1, in process)')
+    parser.add_argument('--risk-workers', type=int, default=1, help='Number of processes used for the Monte Carlo risk simulation (default 1, in process)')
+    parser.add_argument('--no-risk', action='store_true', help='Leave the shock grid and Monte Carlo VaR section out of the report')
+    parser.add_argument('--backend', choices=['matplotlib', 'interactive'], default='matplotlib',
+                        help='Render figures with matplotlib or write chart data for the in-browser viewer')
+    parser.add_argument('--image-format', choices=['inline', 'png', 'webp', 'svg'], default='inline',
+                        help='Embed figures in plots.html (inline) or write them as lazy-loaded image files')
+    parser.add_argument('--incremental', action='store_true', help='Only recompute positions and report sections that changed since the last snapshot')
+    parser.add_argument('--no-cache', action='store_true', help='Parse broker files and render figures without using the parse and figure caches')
+    parser.add_argument('--clear-cache', action='store_true', help='Empty the parse, figure and web result caches before running')
+    parser.add_argument('--config-dir', default=None, help='Directory holding harmonization.json and visualization.json (default: the repo config/)')
+    parser.add_argument('--no-plots', action='store_true', help='Harmonize and annotate only; skip the plots and expiring options report')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='WARNING silences progress output and the annotation dump')
+    parser.add_argument('--timings', action='store_true', help='Print a per-stage timing summary at the end of the run')
+    parser.add_argument('--metrics', default=None, help='Write per-stage metrics to this JSON file')
+    parser.add_argument('--profile-dir', default=None, help='Run every stage under cProfile and dump the stats here')
+    parser.add_argument('--trace-memory', action='store_true', help='Trace peak allocations per stage (slower)')
     
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+    if args.config_dir:
+        set_config_dir(args.config_dir)
+
+    inputs = [('fidelity', path) for path in args.fidelity] + [('tastytrade', path) for path in args.tastytrade]
+    for spec in args.input:
+        broker, sep, path = spec.partition('=')
+        if not sep:
+            parser.error(f"--input expects BROKER=PATH, got {spec}")
+        inputs.append((broker, path))
+    if not inputs:
+        parser.error("at least one positions CSV is required")
+
+    cache = None if args.no_cache else ParseCache()
+    figure_cache = None if args.no_cache else FigureCache()
+    if args.clear_cache:
+        ParseCache().clear()
+        FigureCache().clear()
+        ResultCache().clear()
+    instrumentation = Instrumentation(profile_dir=args.profile_dir, trace_memory=args.trace_memory)
     
-    stocks_df, options_df = harmonize_and_store(args.fidelity, args.tastytrade, args.format, args.output)
-    annotaions_from_df(options_df)
+    stocks_df, options_df, changes = harmonize_and_store(inputs, args.format, args.output, cache=cache, workers=args.workers,
+                                                         incremental=args.incremental, instrumentation=instrumentation)
+    with instrumentation.stage('annotate', rows_in=len(options_df)):
+        annotaions_from_df(options_df)
     
     # Add plotting and reporting
-    plotter = PlotPositions(input_dir=args.output, output_dir=args.output)
-    plotter.plot_all(stocks_df, options_df)
-    plotter.report_expiring_options(options_df)
\ No newline at end of file
+    if not args.no_plots:
+        from PlotPositions import PlotPositions  # Import the plotting class
+        plotter = PlotPositions(input_dir=args.output, output_dir=args.output, workers=args.plot_workers,
+                                figure_cache=figure_cache, image_format=args.image_format,
+                                backend=args.backend, risk_workers=args.risk_workers, risk=not args.no_risk)
+        with instrumentation.stage('plot', rows_in=len(stocks_df) + len(options_df)):
+            plotter.plot_all(stocks_df, options_df, changes=changes)
+        with instrumentation.stage('report', rows_in=len(options_df)):
+            plotter.report_expiring_options(options_df)
+
+    if args.metrics:
+        instrumentation.write_json(args.metrics)
+    if args.timings:
+        print(instrumentation.summary())
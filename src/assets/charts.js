@@ -0,0 +1,151 @@
+/* Minimal SVG charts for the interactive positions report.
+ * Bundled with the report so it opens offline from file://; no dependencies. */
+(function (global) {
+  'use strict';
+
+  var SVG_NS = 'http://www.w3.org/2000/svg';
+  var MARGIN = {top: 28, right: 14, bottom: 58, left: 70};
+  var PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                 '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+
+  function el(name, attrs, parent) {
+    var node = document.createElementNS(SVG_NS, name);
+    Object.keys(attrs || {}).forEach(function (key) { node.setAttribute(key, attrs[key]); });
+    if (parent) parent.appendChild(node);
+    return node;
+  }
+
+  function text(parent, x, y, str, attrs) {
+    var node = el('text', Object.assign({x: x, y: y}, attrs || {}), parent);
+    node.textContent = str;
+    return node;
+  }
+
+  // hover tooltip
+  function tip(node, str) {
+    el('title', {}, node).textContent = str;
+  }
+
+  function fmt(v) {
+    return Math.abs(v) >= 1000 ? v.toLocaleString(undefined, {maximumFractionDigits: 0}) : String(+v.toFixed(2));
+  }
+
+  function niceTicks(lo, hi, count) {
+    var span = hi - lo || 1;
+    var step = Math.pow(10, Math.floor(Math.log10(span / count)));
+    var err = span / count / step;
+    if (err >= 7.5) step *= 10; else if (err >= 3.5) step *= 5; else if (err >= 1.5) step *= 2;
+    var ticks = [];
+    for (var v = Math.ceil(lo / step) * step; v <= hi + step * 1e-9; v += step) ticks.push(+v.toFixed(10));
+    return ticks;
+  }
+
+  function scale(lo, hi, a, b) {
+    return function (v) { return a + (v - lo) / (hi - lo || 1) * (b - a); };
+  }
+
+  function frame(container, opts) {
+    var width = opts.width || 480, height = opts.height || 300;
+    var svg = el('svg', {width: width, height: height, viewBox: '0 0 ' + width + ' ' + height, 'class': 'chart'}, container);
+    var plot = {x0: MARGIN.left, x1: width - MARGIN.right, y0: height - MARGIN.bottom, y1: MARGIN.top};
+    var mid = (plot.y0 + plot.y1) / 2;
+    if (opts.title) text(svg, width / 2, 18, opts.title, {'text-anchor': 'middle', 'class': 'title'});
+    if (opts.xlabel) text(svg, (plot.x0 + plot.x1) / 2, height - 6, opts.xlabel, {'text-anchor': 'middle', 'class': 'label'});
+    if (opts.ylabel) text(svg, 14, mid, opts.ylabel, {'text-anchor': 'middle', 'class': 'label', transform: 'rotate(-90 14 ' + mid + ')'});
+    return {svg: svg, plot: plot};
+  }
+
+  function axes(svg, plot, y, ylim, grid) {
+    niceTicks(ylim[0], ylim[1], 5).forEach(function (v) {
+      var py = y(v);
+      el('line', {x1: grid ? plot.x1 : plot.x0 - 4, x2: plot.x0, y1: py, y2: py, 'class': grid ? 'grid' : 'tick'}, svg);
+      text(svg, plot.x0 - 6, py + 4, fmt(v), {'text-anchor': 'end', 'class': 'ticklabel'});
+    });
+    el('rect', {x: plot.x0, y: plot.y1, width: plot.x1 - plot.x0, height: plot.y0 - plot.y1, 'class': 'axes'}, svg);
+  }
+
+  function xLabel(svg, x, y, str, rotate) {
+    var attrs = {'text-anchor': rotate ? 'end' : 'middle', 'class': 'ticklabel'};
+    if (rotate) attrs.transform = 'rotate(-90 ' + x + ' ' + y + ')';
+    text(svg, x, y, str, attrs);
+  }
+
+  /* Grouped bars.
+   * opts.categories: x labels; opts.series: [{name, color, values}], color may hold one per category;
+   * opts.ylim: [lo, hi];
+   * opts.shadeNegative: shade below zero; opts.rotate: rotate x labels */
+  function barChart(container, opts) {
+    var f = frame(container, opts), svg = f.svg, plot = f.plot;
+    var y = scale(opts.ylim[0], opts.ylim[1], plot.y0, plot.y1);
+    var zero = Math.min(Math.max(y(0), plot.y1), plot.y0);
+    if (opts.shadeNegative) {
+      el('rect', {x: plot.x0, y: zero, width: plot.x1 - plot.x0, height: plot.y0 - zero, 'class': 'negative'}, svg);
+    }
+    axes(svg, plot, y, opts.ylim, opts.grid);
+    var n = opts.categories.length, band = (plot.x1 - plot.x0) / Math.max(n, 1);
+    var width = band * 0.5 / opts.series.length;
+    opts.categories.forEach(function (category, i) {
+      var cx = plot.x0 + band * (i + 0.5);
+      opts.series.forEach(function (s, j) {
+        var v = s.values[i];
+        if (!v) return;
+        var top = Math.max(Math.min(y(v), plot.y0), plot.y1);
+        var bar = el('rect', {x: cx - band * 0.25 + j * width, y: Math.min(top, zero), width: width,
+                              height: Math.abs(top - zero), fill: Array.isArray(s.color) ? s.color[i] : s.color,
+                              'class': 'bar'}, svg);
+        tip(bar, category + (s.name ? ' ' + s.name : '') + ': $' + fmt(v));
+      });
+      xLabel(svg, cx, plot.y0 + (opts.rotate ? 8 : 16), category, opts.rotate);
+    });
+    return svg;
+  }
+
+  /* Scatter of [x, y] points.
+   * opts.points, opts.color, opts.xticks (always shown), opts.ylim: [lo, hi] */
+  function scatterChart(container, opts) {
+    var f = frame(container, opts), svg = f.svg, plot = f.plot;
+    var xs = opts.points.map(function (p) { return p[0]; }).concat(opts.xticks);
+    var lo = Math.min.apply(null, xs), hi = Math.max.apply(null, xs), pad = (hi - lo) * 0.05;
+    var x = scale(lo - pad, hi + pad, plot.x0, plot.x1);
+    var y = scale(opts.ylim[0], opts.ylim[1], plot.y0, plot.y1);
+    axes(svg, plot, y, opts.ylim, true);
+    opts.xticks.forEach(function (v) {
+      el('line', {x1: x(v), x2: x(v), y1: plot.y0, y2: plot.y1, 'class': 'grid'}, svg);
+      xLabel(svg, x(v), plot.y0 + 8, String(v), true);
+    });
+    opts.points.forEach(function (p) {
+      var dot = el('circle', {cx: x(p[0]), cy: y(p[1]), r: 6, fill: opts.color, 'class': 'dot'}, svg);
+      tip(dot, 'strike ' + fmt(p[1]) + ', ' + p[0] + ' DTE');
+    });
+    return svg;
+  }
+
+  /* Pie with percent labels. opts.labels, opts.values */
+  function pieChart(container, opts) {
+    var width = opts.width || 480, height = opts.height || 360;
+    var svg = el('svg', {width: width, height: height, viewBox: '0 0 ' + width + ' ' + height, 'class': 'chart'}, container);
+    if (opts.title) text(svg, width / 2, 18, opts.title, {'text-anchor': 'middle', 'class': 'title'});
+    var total = opts.values.reduce(function (a, b) { return a + b; }, 0);
+    if (!total) {
+      text(svg, width / 2, height / 2, opts.empty || 'No data', {'text-anchor': 'middle', 'class': 'label'});
+      return svg;
+    }
+    var cx = width / 2, cy = height / 2 + 10, r = Math.min(width, height) / 2 - 60, angle = -Math.PI / 2;
+    opts.values.forEach(function (v, i) {
+      var sweep = v / total * 2 * Math.PI, end = angle + sweep, midAngle = angle + sweep / 2;
+      var d = sweep >= 2 * Math.PI - 1e-9
+        ? 'M' + (cx - r) + ',' + cy + 'a' + r + ',' + r + ' 0 1,0 ' + 2 * r + ',0a' + r + ',' + r + ' 0 1,0 ' + -2 * r + ',0'
+        : 'M' + cx + ',' + cy + 'L' + (cx + r * Math.cos(angle)) + ',' + (cy + r * Math.sin(angle)) +
+          'A' + r + ',' + r + ' 0 ' + (sweep > Math.PI ? 1 : 0) + ',1 ' + (cx + r * Math.cos(end)) + ',' + (cy + r * Math.sin(end)) + 'Z';
+      var pct = (v / total * 100).toFixed(1) + '%';
+      tip(el('path', {d: d, fill: PALETTE[i % PALETTE.length], 'class': 'slice'}, svg), opts.labels[i] + ': $' + fmt(v) + ' (' + pct + ')');
+      var lx = cx + r * 1.12 * Math.cos(midAngle), ly = cy + r * 1.12 * Math.sin(midAngle);
+      text(svg, lx, ly, opts.labels[i], {'text-anchor': Math.cos(midAngle) < 0 ? 'end' : 'start', 'class': 'ticklabel'});
+      text(svg, cx + r * 0.6 * Math.cos(midAngle), cy + r * 0.6 * Math.sin(midAngle) + 4, pct, {'text-anchor': 'middle', 'class': 'pct'});
+      angle = end;
+    });
+    return svg;
+  }
+
+  global.Charts = {barChart: barChart, scatterChart: scatterChart, pieChart: pieChart};
+})(window);
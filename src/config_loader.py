@@ -0,0 +1,31 @@
+"""cached loading of the json files in config/, independent of the working directory"""
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+# environment variable naming a directory to read config files from instead of the repo's config/
+CONFIG_DIR_ENV = 'PINE_SCRIPTS_CONFIG_DIR'
+DEFAULT_CONFIG_DIR = Path(__file__).resolve().parent.parent / 'config'
+
+def config_dir():
+    """Directory config files are read from: $PINE_SCRIPTS_CONFIG_DIR, else the repo's config/"""
+    return Path(os.environ.get(CONFIG_DIR_ENV) or DEFAULT_CONFIG_DIR)
+
+def set_config_dir(path):
+    """Read config files from path, in this process and in worker processes it starts"""
+    os.environ[CONFIG_DIR_ENV] = str(Path(path).expanduser().resolve())
+
+def load_config(name):
+    """Return the parsed config/<name>.json; a file is read again only once its mtime changes.
+
+    Long running processes (the web server and its job workers) so pick up edits
+    to the config without a restart.
+    """
+    path = config_dir() / f'{name}.json'
+    return read_config(path, path.stat().st_mtime_ns)
+
+@lru_cache(maxsize=32)
+def read_config(path, mtime_ns):
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -1,135 +1,147 @@
 """utilities for parsing fidelity and tastytrade csv file"""
-import re
-from datetime import datetime
+import logging
+import numpy as np
 import pandas as pd
-from parse_utils import parse_month
+from parse_utils import register_parser, format_expiration_columns, open_source
 
-def is_option_row(row):
-    """Determine if a row represents an options position."""
-    description = row.get('Description', '')
-    symbol = row.get('Symbol', '')
-    return bool(re.search(r'\b(CALL|PUT|C|P)\b', description.upper())) and symbol.strip().startswith('-')
+logger = logging.getLogger(__name__)
 
+ASSET_CLASSES = ['OPTION', 'STOCK', 'UNKNOWN']
+
+def classify_rows(df):
+    """Classify every row as OPTION, STOCK or UNKNOWN in a single vectorized pass."""
+    description = df['Description'].fillna('').astype(str).str.upper()
+    symbol = df['Symbol'].fillna('').astype(str).str.strip()
+    is_option = description.str.contains(r'\b(?:CALL|PUT|C|P)\b', regex=True) & symbol.str.startswith('-')
+    asset_class = np.select([df['Description'].isna(), is_option], ['UNKNOWN', 'OPTION'], default='STOCK')
+    return pd.Series(pd.Categorical(asset_class, categories=ASSET_CLASSES), index=df.index)
+
+# dollar columns are cleaned as text; pin their dtype so chunks never infer them as numbers
+TEXT_COLUMNS = {'Last Price': str, 'Cost Basis Total': str}
+
+class FilteredLineReader(object):
+    """File-like wrapper that drops blank lines and quoted footer lines while read_csv consumes it"""
+    def __init__(self, f):
+        self.lines = (line for line in f if line.strip() and not line.startswith('"'))
+        self.buffer = ''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.buffer + ''.join(self.lines)
+            self.buffer = ''
+            return data
+        while len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def __iter__(self):
+        if self.buffer:
+            yield self.buffer
+            self.buffer = ''
+        yield from self.lines
+
+@register_parser
 class FidelityParser(object):
     """Class to parse fidelity csv files"""
-    def __init__(self, csv_file_path):
-        self.csv_file_path = csv_file_path
+    # bump when parsing output changes so cached parses are invalidated
+    PARSER_VERSION = 1
+    BROKER = 'fidelity'
+    CONFIG_SECTION = 'fidelity'
+
+    def __init__(self, source):
+        """source: path, bytes or file object holding the positions export"""
+        self.source = source
 
     def load(self):
         """Load CSV and separate options and stocks"""
-        # remove any blank lines from the csv file
-        with open(self.csv_file_path, 'r') as f:
-            lines = [line for line in f if line.strip() and not line.startswith('"')]
-            self.df = pd.read_csv(pd.io.common.StringIO(''.join(lines)))
+        with open_source(self.source) as f:
+            self.df = self.clean(self.read_csv(f))
+        self.options_df = self.get_options_rows(self.df)
+        self.stock_df = self.get_stock_rows(self.df)
+        logger.info(f"tot|options|stock|diff {len(self.df)}|{len(self.options_df)}|{len(self.stock_df)}|{len(self.df) - (len(self.options_df) + len(self.stock_df))}")
+
+    def iter_chunks(self, chunksize):
+        """Yield cleaned chunks of at most chunksize rows, keeping memory bounded for large exports"""
+        with open_source(self.source) as f:
+            for chunk in self.read_csv(f, chunksize=chunksize):
+                yield self.clean(chunk)
+
+    def read_csv(self, f, **kwargs):
+        """Read the export, skipping blank lines and the quoted disclaimer footer as it streams"""
+        return pd.read_csv(FilteredLineReader(f), dtype=TEXT_COLUMNS, **kwargs)
 
+    def clean(self, df):
+        """Drop non-position rows, convert dollar columns and classify each row"""
         # remove some rows that are not options or equities
         non_equity_symbols = ["CORE**", "Pending activity", "SPAXX**", "FDRXX***", "USD***"]
-        self.df = self.df[~self.df['Symbol'].isin(non_equity_symbols)]
-        
-        #self.df = pd.read_csv(self.csv_file_path)
-        self.df['Last Price'] = self.df['Last Price'].str.replace(r'[\$,]', '', regex=True).astype(float)
-        # Add cost basis cleaning (assuming column exists; adjust if named differently)
+        df = df[~df['Symbol'].isin(non_equity_symbols)].copy()
+
+        df['Last Price'] = df['Last Price'].str.replace(r'[\$,]', '', regex=True).astype(float)
 
         # flag rows with "--" in the cost basis column
-        bad_cost_basis_mask = self.df["Cost Basis Total"] == "--"
-        bad_cost_basis = self.df[bad_cost_basis_mask]
+        bad_cost_basis_mask = df["Cost Basis Total"] == "--"
+        bad_cost_basis = df[bad_cost_basis_mask]
         if bad_cost_basis.shape[0] > 0:
-            print("\nWarning: Found rows with '--' in Cost Basis Total column:")
-            print(bad_cost_basis[["Account Number", "Symbol", "Cost Basis Total"]])
-            print("\n")
+            logger.warning("Found rows with '--' in Cost Basis Total column:\n%s",
+                           bad_cost_basis[["Account Number", "Symbol", "Cost Basis Total"]])
 
-        self.df = self.df[~bad_cost_basis_mask]
+        df = df[~bad_cost_basis_mask].copy()
 
-        if 'Cost Basis Total' in self.df.columns:
-            self.df['Cost Basis Total'] = self.df['Cost Basis Total'].str.replace(r'[\$,]', '', regex=True).astype(float)
+        if 'Cost Basis Total' in df.columns:
+            df['Cost Basis Total'] = df['Cost Basis Total'].str.replace(r'[\$,]', '', regex=True).astype(float)
         else:
-            self.df['Cost Basis Total'] = 0.0  # Fallback if column missing
-        self.options_df = self.get_options_rows(self.df)
-        self.stock_df = self.get_stock_rows(self.df)
-        print(f"tot|options|stock|diff {len(self.df)}|{len(self.options_df)}|{len(self.stock_df)}|{len(self.df) - (len(self.options_df) + len(self.stock_df))}")
+            df['Cost Basis Total'] = 0.0  # Fallback if column missing
+        df['asset_class'] = classify_rows(df)
+        return df
 
     def format_options_data(self):
         """Format options data for output"""
-        options_rows = []
-        for i, row in self.options_df.iterrows():
-            data = self.extract_options_data_from_row(row)
-            if data:
-                options_rows.append(data)
-        return pd.DataFrame(options_rows)
-    
-    def extract_options_data_from_row(self, row):
-        """Extract ticker, expiration, strike, options_type from a row."""
-        description = row.Description
-        quantity = float(row.Quantity)
-        account = row.get('Account Name', '')
-        last_price = float(row.get('Last Price'))
-        cost_basis = float(row.get('Cost Basis Total', 0))
-        print(description)
-        
-        # Extract ticker: first word before space
-        ticker_match = re.match(r'^(\w+)', description)
-        if not ticker_match:
-            return None
-        ticker = ticker_match.group(1)
-        
-        # Parse expiration: e.g., "FEB 20 2026"
-        exp_match = re.search(r'(\w{3})\s+(\d{1,2})\s+(\d{4})', description)
-        if not exp_match:
-            return None
-        month_str, day_str, year_str = exp_match.groups()
-        month = parse_month(month_str)
-        day = int(day_str)
-        year = int(year_str)
-        
-        # Create YYYY-MM-DD
-        expiration_date = datetime(year, month, day).strftime('%Y-%m-%d')
-        
-        # Extract strike: e.g., $470
-        strike_match = re.search(r'\$(\d+(?:\.\d+)?)', description)
-        if not strike_match:
-            return None
-        strike = float(strike_match.group(1))
-        
-        # Determine call/put from Description or Symbol
-        is_call = 'CALL' in description.split(" ")[-1].upper()
-        is_put = 'PUT' in description.split(" ")[-1].upper()
-        
-        if not (is_call or is_put):
-            return None
-        
+        df = self.options_df
+        description = df['Description'].astype(str)
+
+        # Extract ticker (first word), expiration (e.g. "FEB 20 2026") and strike (e.g. $470)
+        ticker = description.str.extract(r'^(\w+)', expand=False)
+        exp_parts = description.str.extract(r'(\w{3})\s+(\d{1,2})\s+(\d{4})')
+        expiration = format_expiration_columns(exp_parts[0], exp_parts[1], exp_parts[2])
+        strike = description.str.extract(r'\$(\d+(?:\.\d+)?)', expand=False).astype(float)
+
+        # Determine call/put from the last word of the description
+        last_word = description.str.rsplit(' ', n=1).str[-1].str.upper()
+        is_call = last_word.str.contains('CALL', regex=False)
+        is_put = last_word.str.contains('PUT', regex=False)
+
+        valid = ticker.notna() & expiration.notna() & strike.notna() & (is_call | is_put)
+        self.rejected_options_df = df[~valid]
+        if self.rejected_options_df.shape[0] > 0:
+            logger.warning("Could not parse option description for rows:\n%s",
+                           self.rejected_options_df[[c for c in ["Account Number", "Symbol", "Description"] if c in df.columns]])
+
         # Long/Short from quantity
+        quantity = df['Quantity'].astype(float)
         is_long = quantity > 0
-        is_short = quantity < 0
-        
-        # Options type
-        if is_call:
-            options_type = 'LC' if is_long else 'SC'
-        else:  # put
-            options_type = 'LP' if is_long else 'SP'
-        
-        return {
+        options_type = np.where(is_call, np.where(is_long, 'LC', 'SC'), np.where(is_long, 'LP', 'SP'))
+
+        account = df['Account Name'] if 'Account Name' in df.columns else pd.Series('', index=df.index)
+        options = pd.DataFrame({
             'ticker': ticker,
-            'expiration': expiration_date,
+            'expiration': expiration,
             'strike': strike,
             'options_type': options_type,
             'quantity': quantity,
             'account': account,
-            'last price': last_price,
-            'cost basis': cost_basis
-        }
-
-    def get_good_rows(self, df):
-        """Filter rows that likely contain valid positions."""
-        return df.dropna(subset=['Description'])
+            'last price': df['Last Price'].astype(float),
+            'cost basis': df['Cost Basis Total'].astype(float),
+        }, index=df.index)
+        return options[valid].reset_index(drop=True)
 
     def get_options_rows(self, df):
         """Filter rows that contain options positions"""
-        df = self.get_good_rows(df)
-        df = df[df.apply(is_option_row, axis=1)]
-        return df
+        return df[df['asset_class'] == 'OPTION']
 
     def get_stock_rows(self, df):
         """Filter rows that contain non-options positions"""
-        df = self.get_good_rows(df)
-        df = df[~df.apply(is_option_row, axis=1)]
-        return df
\ No newline at end of file
+        return df[df['asset_class'] == 'STOCK']
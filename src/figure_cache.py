@@ -0,0 +1,88 @@
+"""on-disk cache of rendered report figures keyed by their plot inputs"""
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'pine_scripts' / 'figures'
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+def update_digest(digest, value):
+    """Feed a plot argument into digest; frames are hashed by content, not identity"""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(t) for t in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+def figure_key(render, *context):
+    """Content hash of a functools.partial render call plus context (config, code version)"""
+    digest = hashlib.sha256(render.func.__qualname__.encode())
+    for value in list(render.args) + sorted(render.keywords.items()) + list(context):
+        update_digest(digest, value)
+    return digest.hexdigest()
+
+class FigureCache(object):
+    """Cache the html of rendered figures (the encoded image and its heading).
+
+    Entries are single files named by figure_key, so a figure is only drawn again
+    when the rows it plots, the plot config or the plotting code version change.
+    Least recently used entries are evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def read(self, key):
+        """Return the cached html for key, or None on a miss"""
+        path = self.cache_dir / f'{key}.html'
+        try:
+            html = path.read_text()
+        except OSError:
+            return None
+        # mark as recently used for LRU eviction
+        os.utime(path)
+        return html
+
+    def write(self, key, html):
+        """Store html under key, then evict old entries past the size limit"""
+        path = self.cache_dir / f'{key}.html'
+        tmp_path = path.with_name(path.name + f'.tmp{os.getpid()}')
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(html)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache figure in {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """Return cache entries, least recently used first"""
+        if not self.cache_dir.exists():
+            return []
+        return sorted(self.cache_dir.glob('*.html'), key=lambda p: p.stat().st_mtime)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        sizes = [entry.stat().st_size for entry in entries]
+        total = sum(sizes)
+        for entry, size in zip(entries, sizes):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        """Remove every cached figure"""
+        for entry in self.entries():
+            entry.unlink(missing_ok=True)
+        logger.info(f"Cleared figure cache at {self.cache_dir}")
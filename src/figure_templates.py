@@ -0,0 +1,124 @@
+"""reusable per-ticker figure layouts; only the data artists change between tickers"""
+import numpy as np
+from matplotlib.figure import Figure
+from plot_data import SHORT_DTE_TICKS, LONG_DTE_TICKS, type_exposure, strike_ladder, exposure_limit, dte_split
+
+# width pandas gives a group of bars at one category (DataFrame.plot(kind='bar') default)
+BAR_WIDTH = 0.5
+
+def padded_limits(values, ticks, margin=0.05):
+    """View limits covering the fixed ticks and the data, padded like matplotlib autoscaling"""
+    lo = min(np.min(ticks), np.min(values)) if len(values) else np.min(ticks)
+    hi = max(np.max(ticks), np.max(values)) if len(values) else np.max(ticks)
+    pad = (hi - lo) * margin
+    return lo - pad, hi + pad
+
+class ExposureTemplate(object):
+    """Exposure by type and strike ladder figure for one ticker.
+
+    Titles, labels, tick styling, the type bars and the negative-area shading are
+    built once; each render sets the type bar heights, replaces the strike ladder
+    bars and rescales y. The layout is fixed when the template is built, so no
+    tight_layout runs per ticker.
+    """
+    def __init__(self, types, colors):
+        self.types = types
+        self.colors = colors
+        self.fig = Figure(figsize=(10, 4))
+        self.ax1, self.ax2 = self.fig.subplots(1, 2, sharey=True)
+
+        # 1. Exposure by Type: Bar per type, net value
+        self.type_bars = self.ax1.bar(np.arange(len(types)), np.zeros(len(types)), BAR_WIDTH, color=colors)
+        self.ax1.set_xticks(np.arange(len(types)))
+        self.ax1.set_xticklabels(types, rotation=90)
+        self.ax1.set_xlim(-0.5, len(types) - 0.5)
+        self.ax1.set_title("Exposure by Type")
+        self.ax1.set_xlabel("Option Type", fontsize=14)
+        self.ax1.set_ylabel("Net Exposure ($)", fontsize=14)
+
+        # 2. Strike Ladder: Bar by strike, value per type
+        self.ladder_bars = []
+        self.ax2.set_title("Strike Ladder")
+        self.ax2.set_xlabel("Strike Price", fontsize=14)
+        self.ax2.set_ylabel("", fontsize=14)  # Remove y-label for right plot
+
+        self.shades = []
+        for ax in (self.ax1, self.ax2):
+            ax.tick_params(axis='both', labelsize=14)
+            # Shade negative area, resized to the y-limits on each render
+            self.shades.append(ax.axhspan(-1, 0, color='lightblue', alpha=0.3))
+        self.ax2.tick_params(axis='x', rotation=0)
+
+        # lay out once with wide placeholder tick labels
+        self.ax1.set_ylim(-100000, 100000)
+        self.fig.tight_layout()
+        # tight_layout leaves a placeholder engine that makes savefig draw twice
+        self.fig.set_layout_engine('none')
+
+    def render(self, group):
+        """Draw the positions of one ticker's group into the template"""
+        for bar, value in zip(self.type_bars, type_exposure(group, self.types)):
+            bar.set_height(value)
+
+        for bars in self.ladder_bars:
+            bars.remove()
+        strike_group = strike_ladder(group, self.types)
+        positions = np.arange(len(strike_group))
+        width = BAR_WIDTH / len(self.types)
+        self.ladder_bars = [
+            self.ax2.bar(positions - BAR_WIDTH / 2 + (i + 0.5) * width, strike_group[t].values, width, color=color)
+            for i, (t, color) in enumerate(zip(self.types, self.colors))
+        ]
+        self.ax2.set_xticks(positions)
+        self.ax2.set_xticklabels(strike_group.index.astype(str))
+        self.ax2.set_xlim(-0.5, len(strike_group) - 0.5)
+
+        # Calculate symmetric y-limits centered on zero
+        max_abs = exposure_limit(group)
+        self.ax1.set_ylim(-max_abs, max_abs)
+        for shade in self.shades:
+            shade.set_y(-max_abs)
+            shade.set_height(max_abs)
+        return self.fig
+
+class ExpirationsTemplate(object):
+    """Strike vs days-to-expiration scatter for one ticker, short and long dated.
+
+    The axes, fixed DTE ticks and grids are built once; each render only moves the
+    scatter offsets and sets the view limits.
+    """
+    def __init__(self):
+        self.fig = Figure(figsize=(10, 4))
+        self.ax1, self.ax2 = self.fig.subplots(1, 2, sharey=True)
+        self.short_dated = self.ax1.scatter([], [], c='red', alpha=0.3, marker='o', s=100)
+        self.long_dated = self.ax2.scatter([], [], c='blue', alpha=0.3, marker='o', s=100)
+        for ax, xticks in ((self.ax1, SHORT_DTE_TICKS), (self.ax2, LONG_DTE_TICKS)):
+            ax.set_title("Expiration Prices")
+            ax.set_xlabel("Days to Expiration", fontsize=14)
+            ax.set_ylabel("Strike", fontsize=14)
+            ax.tick_params(axis='both', labelsize=14)
+            ax.tick_params(axis='x', rotation=90)
+            ax.grid(True, linestyle='--', alpha=0.7)
+            # Set specific x-ticks
+            ax.set_xticks(xticks)
+            ax.set_xticklabels(xticks)
+
+        # lay out once with wide placeholder tick labels
+        self.ax1.set_ylim(0, 10000)
+        self.fig.tight_layout()
+        # tight_layout leaves a placeholder engine that makes savefig draw twice
+        self.fig.set_layout_engine('none')
+
+    def render(self, group):
+        """Draw the positions of one ticker's group (with a DTE column) into the template"""
+        st_group, lt_group = dte_split(group)
+        for scatter, ax, part, xticks in ((self.short_dated, self.ax1, st_group, SHORT_DTE_TICKS),
+                                          (self.long_dated, self.ax2, lt_group, LONG_DTE_TICKS)):
+            scatter.set_offsets(np.column_stack([part['DTE'].values, part['strike'].values]).reshape(-1, 2))
+            ax.set_xlim(padded_limits(part['DTE'].values, xticks))
+
+        strikes = group['strike'].values
+        lo, hi = strikes.min(), strikes.max()
+        pad = (hi - lo) * 0.05 or max(abs(lo) * 0.05, 1)
+        self.ax1.set_ylim(lo - pad, hi + pad)
+        return self.fig
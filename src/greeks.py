@@ -0,0 +1,208 @@
+"""vectorized Black-Scholes pricing, implied volatility and Greeks for option legs"""
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_MULTIPLIER = 100
+DAYS_PER_YEAR = 365.0
+RISK_FREE_RATE = 0.04
+# volatility used for legs whose last price does not give an implied volatility
+DEFAULT_VOLATILITY = 0.30
+IV_BOUNDS = (1e-4, 5.0)
+
+GREEK_COLUMNS = ['underlying price', 'dte', 'iv', 'delta', 'gamma', 'theta', 'vega', 'delta dollars', 'theta per day']
+
+# Hart's double precision rational approximation of the normal tail (West, 2005)
+HART_NUMERATOR = (3.52624965998911e-02, 0.700383064443688, 6.37396220353165, 33.912866078383,
+                  112.079291497871, 221.213596169931, 220.206867912376)
+HART_DENOMINATOR = (8.83883476483184e-02, 1.75566716318264, 16.064177579207, 86.7807322029461,
+                    296.564248779674, 637.333633378831, 793.826512519948, 440.413735824752)
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+def horner(coefficients, z):
+    """Polynomial with coefficients highest power first at z, updated in place to save temporaries"""
+    value = np.full_like(z, coefficients[0])
+    for coefficient in coefficients[1:]:
+        value *= z
+        value += coefficient
+    return value
+
+def norm_cdf(x):
+    """Standard normal cdf for arrays to about 1e-14, without scipy.
+
+    Each element only evaluates the branch it needs: the rational approximation
+    below z = 7.07 and the continued fraction in the far tail.
+    """
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x)
+    tail = np.where(np.isnan(z), np.nan, 0.0)
+    near = z < 7.07106781186547
+    far = (z >= 7.07106781186547) & (z <= 37)
+    zn = z[near]
+    tail[near] = np.exp(-0.5 * zn * zn) * horner(HART_NUMERATOR, zn) / horner(HART_DENOMINATOR, zn)
+    zf = z[far]
+    fraction = zf + 1 / (zf + 2 / (zf + 3 / (zf + 4 / (zf + 0.65))))
+    tail[far] = np.exp(-0.5 * zf * zf) / (2.506628274631 * fraction)
+    return np.where(x > 0, 1.0 - tail, tail)
+
+def leg_kinds(options_type):
+    """(is_call, is_forward) boolean arrays from options_type codes; SYN_LONG legs price as forwards"""
+    codes = np.asarray(options_type, dtype=str)
+    return np.char.endswith(codes, 'C'), codes == 'SYN_LONG'
+
+def d1_d2(spot, strike, years, vol, rate):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_time = vol * np.sqrt(years)
+        d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / vol_time
+    return d1, d1 - vol_time
+
+def bs_price(spot, strike, years, vol, rate=RISK_FREE_RATE, is_call=True, is_forward=False):
+    """Per-share value of calls, puts and forwards; inputs broadcast against each other.
+
+    At or after expiry (years <= 0) the value is the intrinsic value.
+    """
+    discounted = strike * np.exp(-rate * np.maximum(years, 0))
+    d1, d2 = d1_d2(spot, strike, years, vol, rate)
+    call = spot * norm_cdf(d1) - discounted * norm_cdf(d2)
+    # put-call parity saves evaluating the cdf twice more
+    value = np.where(is_call, call, call - spot + discounted)
+    intrinsic = np.where(is_call, np.maximum(spot - strike, 0), np.maximum(strike - spot, 0))
+    value = np.where(years > 0, value, intrinsic)
+    return np.where(is_forward, spot - discounted, value)
+
+def bs_greeks(spot, strike, years, vol, rate=RISK_FREE_RATE, is_call=True, is_forward=False):
+    """Per-share delta, gamma, theta (per year) and vega (per 1.00 of vol) as a dict of arrays"""
+    discounted = strike * np.exp(-rate * np.maximum(years, 0))
+    d1, d2 = d1_d2(spot, strike, years, vol, rate)
+    live = years > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pdf = norm_pdf(d1)
+        gamma = pdf / (spot * vol * np.sqrt(years))
+        vega = spot * pdf * np.sqrt(years)
+        decay = -spot * pdf * vol / (2 * np.sqrt(years))
+    delta = np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1)
+    theta = decay + np.where(is_call, -rate * discounted * norm_cdf(d2), rate * discounted * norm_cdf(-d2))
+    # expired legs keep their exercise delta and have no time value left
+    expired_delta = np.where(is_call, 1.0 * (spot > strike), -1.0 * (spot < strike))
+    greeks = {
+        'delta': np.where(live, delta, expired_delta),
+        'gamma': np.where(live, gamma, 0.0),
+        'theta': np.where(live, theta, 0.0),
+        'vega': np.where(live, vega, 0.0),
+    }
+    # a synthetic long (long call + short put, same strike) is a forward
+    greeks['delta'] = np.where(is_forward, 1.0, greeks['delta'])
+    greeks['gamma'] = np.where(is_forward, 0.0, greeks['gamma'])
+    greeks['theta'] = np.where(is_forward, -rate * discounted, greeks['theta'])
+    greeks['vega'] = np.where(is_forward, 0.0, greeks['vega'])
+    return greeks
+
+def implied_volatility(price, spot, strike, years, rate=RISK_FREE_RATE, is_call=True, tol=1e-6, max_iter=100):
+    """Solve bs_price(vol) == price for every element at once.
+
+    Newton steps are kept inside a bisection bracket and each pass only prices
+    the elements still unconverged. Prices outside the no-arbitrage bounds,
+    expired legs and forwards give NaN.
+    """
+    price, spot, strike, years = (np.asarray(a, dtype=float) for a in (price, spot, strike, years))
+    price, spot, strike, years, is_call = np.broadcast_arrays(price, spot, strike, years, np.asarray(is_call))
+    discounted = strike * np.exp(-rate * np.maximum(years, 0))
+    lower = np.where(is_call, np.maximum(spot - discounted, 0), np.maximum(discounted - spot, 0))
+    upper = np.where(is_call, spot, discounted)
+    valid = np.isfinite(price) & np.isfinite(spot) & (years > 0) & (price > lower) & (price < upper)
+
+    # iterate on the unconverged elements only, dropping each as it converges
+    vol = np.full(price.shape, np.nan)
+    index = np.flatnonzero(valid)
+    price, spot, strike, years, is_call = (a.ravel()[index] for a in (price, spot, strike, years, is_call))
+    low = np.full(index.shape, IV_BOUNDS[0])
+    high = np.full(index.shape, IV_BOUNDS[1])
+    guess = np.full(index.shape, DEFAULT_VOLATILITY)
+    for _ in range(max_iter):
+        diff = bs_price(spot, strike, years, guess, rate, is_call) - price
+        done = (np.abs(diff) <= tol) | (high - low <= tol)
+        vol.flat[index[done]] = guess[done]
+        keep = ~done
+        if not keep.any():
+            break
+        index, price, spot, strike, years, is_call, low, high, guess, diff = (
+            a[keep] for a in (index, price, spot, strike, years, is_call, low, high, guess, diff))
+        # the price rises with vol, so the sign of diff moves one side of the bracket
+        high = np.where(diff > 0, guess, high)
+        low = np.where(diff < 0, guess, low)
+        d1, _ = d1_d2(spot, strike, years, guess, rate)
+        vega = spot * norm_pdf(d1) * np.sqrt(years)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = guess - diff / vega
+        guess = np.where((newton > low) & (newton < high) & (vega > 1e-8), newton, (low + high) / 2)
+    else:
+        # out of iterations: keep the best estimate so far
+        vol.flat[index] = guess
+    return vol
+
+def underlying_prices(stocks_df=None, prices=None):
+    """Price per ticker from the stock rows, overridden by prices (a mapping or ticker-indexed Series)"""
+    table = pd.Series(dtype=float)
+    if stocks_df is not None and not stocks_df.empty:
+        table = stocks_df.dropna(subset=['last price']).groupby('ticker', observed=True)['last price'].first()
+        table.index = table.index.astype(str)
+    if prices is not None:
+        prices = pd.Series(prices, dtype=float)
+        prices.index = prices.index.astype(str)
+        table = pd.concat([table[~table.index.isin(prices.index)], prices])
+    return table
+
+def add_greeks(options_df, stocks_df=None, prices=None, current_date=None, rate=RISK_FREE_RATE,
+               fallback_vol=DEFAULT_VOLATILITY):
+    """Return options_df with the GREEK_COLUMNS added, priced in one batch.
+
+    Per-share Greeks come from the implied volatility of each leg's last price;
+    legs without one (no price, price outside the arbitrage bounds, SYN_LONG) use
+    fallback_vol and keep NaN in 'iv'. 'delta dollars' is the position's dollar
+    exposure to the underlying and 'theta per day' its daily decay in dollars.
+    Legs whose ticker has no underlying price get NaN Greeks.
+    """
+    current_date = pd.Timestamp(current_date or pd.Timestamp.today()).normalize()
+    spot = options_df['ticker'].astype(str).map(underlying_prices(stocks_df, prices)).to_numpy(dtype=float)
+    strike = options_df['strike'].to_numpy(dtype=float)
+    dte = (pd.to_datetime(options_df['expiration']) - current_date).dt.days.to_numpy(dtype=float)
+    years = np.maximum(dte, 0) / DAYS_PER_YEAR
+    is_call, is_forward = leg_kinds(options_df['options_type'].astype(str))
+
+    iv = implied_volatility(options_df['last price'].to_numpy(dtype=float), spot, strike, years, rate, is_call)
+    missing = np.isnan(iv) & ~is_forward & (years > 0)
+    if missing.any():
+        logger.info(f"No implied volatility for {missing.sum()} of {len(iv)} legs; using {fallback_vol:.0%}")
+    greeks = bs_greeks(spot, strike, years, np.where(np.isnan(iv), fallback_vol, iv), rate, is_call, is_forward)
+
+    shares = options_df['quantity'].to_numpy(dtype=float) * CONTRACT_MULTIPLIER
+    return options_df.assign(**{
+        'underlying price': spot,
+        'dte': dte,
+        'iv': iv,
+        **greeks,
+        'delta dollars': greeks['delta'] * shares * spot,
+        'theta per day': greeks['theta'] * shares / DAYS_PER_YEAR,
+    })
+
+def ticker_greeks(greeks_df, stocks_df=None):
+    """Per-ticker totals of delta dollars (stock included when given), dollar gamma per 1%, theta per day and vega per vol point"""
+    shares = greeks_df['quantity'].astype(float) * CONTRACT_MULTIPLIER
+    spot = greeks_df['underlying price']
+    positions = pd.DataFrame({
+        'ticker': greeks_df['ticker'].astype(str),
+        'delta dollars': greeks_df['delta dollars'],
+        'gamma dollars': greeks_df['gamma'] * shares * spot * spot / 100,
+        'theta per day': greeks_df['theta per day'],
+        'vega': greeks_df['vega'] * shares / 100,
+    })
+    if stocks_df is not None and not stocks_df.empty:
+        positions = pd.concat([positions, pd.DataFrame({
+            'ticker': stocks_df['ticker'].astype(str),
+            'delta dollars': stocks_df['quantity'] * stocks_df['last price'],
+        })], ignore_index=True)
+    return positions.groupby('ticker').sum()
@@ -0,0 +1,52 @@
+"""change sets between two harmonized position snapshots"""
+import pandas as pd
+
+STOCK_KEYS = ['broker', 'account', 'ticker', 'type']
+OPTION_KEYS = ['broker', 'account', 'ticker', 'expiration', 'strike', 'options_type']
+
+class ChangeSet(object):
+    """Rows added, removed and modified between a previous and a current frame.
+
+    added/removed hold the full rows, modified holds the current version of rows
+    whose key exists in both frames but whose values differ.
+    """
+    def __init__(self, added, removed, modified):
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+
+    @property
+    def tickers(self):
+        """Tickers touched by any change"""
+        return set(pd.concat([self.added['ticker'], self.removed['ticker'], self.modified['ticker']]).astype(str))
+
+    @property
+    def empty(self):
+        return self.added.empty and self.removed.empty and self.modified.empty
+
+    def summary(self):
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.modified)} modified"
+
+def diff_positions(previous_df, current_df, keys):
+    """Diff two position frames on keys and return a ChangeSet.
+
+    Repeated keys are told apart by their order of appearance, so duplicate legs
+    in a broker export are matched one to one.
+    """
+    def keyed(df):
+        df = df.reset_index(drop=True)
+        key_df = df[keys].astype(str).assign(occurrence=df.groupby(keys, observed=True, dropna=False).cumcount())
+        return df.set_index(pd.MultiIndex.from_frame(key_df))
+
+    previous = keyed(previous_df)
+    current = keyed(current_df)
+    added = current[~current.index.isin(previous.index)]
+    removed = previous[~previous.index.isin(current.index)]
+
+    common = current.index.intersection(previous.index)
+    values = [col for col in current.columns if col not in keys and col in previous.columns]
+    old = previous.loc[common, values].astype(object)
+    new = current.loc[common, values].astype(object)
+    changed = ((old != new) & ~(old.isna() & new.isna())).any(axis=1)
+    modified = current.loc[common[changed.values]]
+    return ChangeSet(*(df.reset_index(drop=True) for df in (added, removed, modified)))
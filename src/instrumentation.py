@@ -0,0 +1,105 @@
+"""per-stage timing, row counts, memory and optional cProfile capture for the pipeline"""
+import cProfile
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# numbers profile dumps so stages run in the same process never overwrite each other
+PROFILE_COUNTER = itertools.count()
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class Instrumentation(object):
+    """Collects one record per pipeline stage.
+
+    Each record holds the stage name, wall time, rows in/out and the process peak
+    RSS at the end of the stage. With trace_memory the peak Python/NumPy allocation
+    during the stage is traced too, and with profile_dir every stage is run under
+    cProfile and its stats dumped there. A listener, if given, is called as
+    listener('start', record) when a stage begins and listener('end', record) when
+    its record is complete, e.g. to report progress.
+    """
+    def __init__(self, profile_dir=None, trace_memory=False, listener=None):
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.trace_memory = trace_memory
+        self.listener = listener
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None, **detail):
+        """Time the enclosed block; set record['rows_out'] (or other keys) on the yielded record"""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, **detail}
+        if self.listener is not None:
+            self.listener('start', record)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        profiler = None
+        if self.profile_dir is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            if profiler is not None:
+                profiler.disable()
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f'{os.getpid()}_{next(PROFILE_COUNTER):03d}_{name}.prof'
+                profiler.dump_stats(path)
+                record['profile'] = str(path)
+            if self.trace_memory:
+                record['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.records.append(record)
+            if self.listener is not None:
+                self.listener('end', record)
+
+    def child(self):
+        """New empty instance with the same settings (but no listener), e.g. for a worker process"""
+        return Instrumentation(self.profile_dir, self.trace_memory)
+
+    def extend(self, records):
+        self.records.extend(records)
+        if self.listener is not None:
+            for record in records:
+                self.listener('end', record)
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({'stages': self.records, 'total_seconds': self.total_seconds()}, f, indent=2)
+
+    def total_seconds(self):
+        return round(sum(record['seconds'] for record in self.records), 4)
+
+    def summary(self):
+        """Plain-text table of the recorded stages"""
+        def fmt(value):
+            return '-' if value is None else str(value)
+        lines = [f"{'stage':<12} {'seconds':>9} {'rows in':>9} {'rows out':>9} {'peak MB':>9}  detail"]
+        for record in self.records:
+            detail = ' '.join(str(record[key]) for key in ('broker', 'file') if key in record)
+            if record.get('cached'):
+                detail += ' (cached)'
+            lines.append(f"{record['stage']:<12} {record['seconds']:>9.3f} {fmt(record['rows_in']):>9} "
+                         f"{fmt(record['rows_out']):>9} {fmt(record.get('peak_rss_mb')):>9}  {detail}")
+        lines.append(f"{'total':<12} {self.total_seconds():>9.3f}")
+        return '\n'.join(lines)
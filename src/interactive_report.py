@@ -0,0 +1,80 @@
+"""interactive report backend: one compact JSON payload drawn in the browser by a bundled viewer"""
+import json
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from plot_data import (SMALL_POSITION_PCT, SHORT_DTE_TICKS, LONG_DTE_TICKS, current_values, allocation_split,
+                       ticker_groups, type_exposure, strike_ladder, exposure_limit, dte_split)
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = Path(__file__).parent / 'assets'
+VIEWER_TEMPLATE = ASSETS_DIR / 'interactive_viewer.html'
+CHARTS_JS = ASSETS_DIR / 'charts.js'
+# replaced by the payload in the viewer template
+PAYLOAD_MARKER = '/*PLOT_DATA*/null'
+
+def compact(values, digits=2):
+    """Round numbers for the payload; NaN becomes null"""
+    return [None if np.isnan(v) else round(float(v), digits) for v in np.asarray(values, dtype=float)]
+
+def build_payload(stocks_df, options_df, plotting_config, current_date=None):
+    """Collect the data behind every chart of the report into a JSON-serializable dict.
+
+    Per-ticker entries hold the type exposure (in 'types' order), the strike ladder
+    as one value list per type, the symmetric y-limit and [dte, strike] points of
+    the short and long dated expirations.
+    """
+    current_date = current_date or datetime.now()
+    types = list(plotting_config["option_type_codes"].keys())
+
+    sorted_stocks = current_values(stocks_df)
+    large_positions, small_positions = allocation_split(stocks_df)
+
+    tickers = []
+    if not options_df.empty:
+        for ticker, group in ticker_groups(options_df, current_date):
+            ladder = strike_ladder(group, types)
+            st_group, lt_group = dte_split(group)
+            tickers.append({
+                'ticker': str(ticker),
+                'limit': round(float(exposure_limit(group)), 2),
+                'types': compact(type_exposure(group, types)),
+                'strikes': [f'{strike}' for strike in ladder.index],
+                'ladder': [compact(ladder[t]) for t in types],
+                'short': [[int(d), float(s)] for d, s in zip(st_group['DTE'], st_group['strike'])],
+                'long': [[int(d), float(s)] for d, s in zip(lt_group['DTE'], lt_group['strike'])],
+            })
+
+    return {
+        'generated': current_date.strftime('%Y-%m-%d %H:%M'),
+        'types': types,
+        'type_names': plotting_config["option_type_codes"],
+        'colors': [plotting_config["option_colors"][t] for t in types],
+        'current_value': {
+            'tickers': sorted_stocks['ticker'].astype(str).tolist(),
+            'values': compact(sorted_stocks['current value']),
+        },
+        'allocation': {
+            'threshold': SMALL_POSITION_PCT,
+            'large': {'labels': large_positions.index.tolist(), 'values': compact(large_positions)},
+            'small': {'labels': small_positions.index.tolist(), 'values': compact(small_positions)},
+        },
+        'dte_ticks': {'short': SHORT_DTE_TICKS.tolist(), 'long': LONG_DTE_TICKS},
+        'tickers': tickers,
+    }
+
+def write_interactive_report(payload, output_dir):
+    """Write plots.json, and plots.html with the payload embedded next to a copy of charts.js; return the html path"""
+    output_dir = Path(output_dir)
+    data = json.dumps(payload, separators=(',', ':'))
+    (output_dir / 'plots.json').write_text(data)
+    shutil.copyfile(CHARTS_JS, output_dir / CHARTS_JS.name)
+    # embedded rather than fetched, since browsers block fetch() from file:// pages
+    html_content = VIEWER_TEMPLATE.read_text().replace(PAYLOAD_MARKER, data.replace('</', '<\\/'))
+    html_file_path = output_dir / 'plots.html'
+    html_file_path.write_text(html_content)
+    logger.info(f"Wrote interactive report with {len(payload['tickers'])} tickers ({len(data)} bytes of data)")
+    return html_file_path
@@ -0,0 +1,201 @@
+"""background jobs run in a local process pool, with progress kept in per-job status files"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_JOBS_DIR = Path(tempfile.gettempdir()) / 'pine_scripts_jobs'
+STATUS_FILE = 'status.json'
+RESULT_FILE = 'result.html'
+# taken in an output directory by whoever is writing a report there
+LOCK_FILE = '.update.lock'
+LOCK_POLL_SECONDS = 0.2
+# ids made by JobQueue.create; anything else is never looked up on disk
+JOB_ID = re.compile(r'[0-9a-f]{32}')
+
+class JobProgress(object):
+    """Status of one job, written to <job_dir>/status.json on every change.
+
+    The worker process running the job owns the file; it is replaced atomically
+    so the web process can read it at any time. Pass `listener` to
+    Instrumentation to record each pipeline stage as it starts and finishes.
+    """
+    def __init__(self, job_dir):
+        self.job_dir = Path(job_dir)
+        self.state = {'status': 'queued', 'stage': None, 'stages': [], 'detail': {}, 'error': None,
+                      'created': time.time(), 'started': None, 'finished': None}
+
+    def update(self, **fields):
+        self.state.update(fields)
+        tmp_path = self.job_dir / (STATUS_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, default=str)
+        os.replace(tmp_path, self.job_dir / STATUS_FILE)
+
+    def listener(self, event, record):
+        if event == 'start':
+            self.update(stage=record['stage'], detail={})
+        else:
+            self.update(stages=self.state['stages'] + [dict(record)])
+
+    def detail(self, **detail):
+        """Progress within the current stage, e.g. sections written so far"""
+        self.update(detail={**self.state['detail'], **detail})
+
+@contextmanager
+def output_lock(output_dir, blocking=True):
+    """Hold an exclusive lock on output_dir across processes while the block runs.
+
+    Jobs writing to the same directory share the report partial, sections,
+    images and snapshots, so they take turns. With blocking=False a lock held
+    elsewhere raises BlockingIOError instead of waiting.
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(output_dir) / LOCK_FILE, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        raise BlockingIOError(f'{output_dir} is locked')
+                    time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def run_job(job_dir, fn, *args):
+    """Worker entry point: call fn(progress, *args) and write the html it returns to result.html"""
+    progress = JobProgress(job_dir)
+    progress.state = read_status(job_dir) or progress.state
+    progress.update(status='running', started=time.time())
+    try:
+        result = fn(progress, *args)
+        tmp_path = Path(job_dir) / (RESULT_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            for chunk in ([result] if isinstance(result, str) else result):
+                f.write(chunk)
+        os.replace(tmp_path, Path(job_dir) / RESULT_FILE)
+    except Exception as e:
+        progress.update(status='failed', stage=None, error=f'{type(e).__name__}: {e}',
+                        traceback=traceback.format_exc(), finished=time.time())
+        raise
+    progress.update(status='done', stage=None, finished=time.time())
+
+def read_status(job_dir):
+    try:
+        with open(Path(job_dir) / STATUS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class JobQueue(object):
+    """Run jobs in a pool of `workers` processes and look up their status by id.
+
+    Each job gets its own directory under jobs_dir for its status file and
+    result, so concurrent jobs never share a path. Jobs submitted by another
+    process sharing jobs_dir (another web worker, or this one before a restart)
+    are looked up from their status file. Finished jobs are kept for
+    `keep_seconds` and then removed with their directories.
+    """
+    def __init__(self, workers=2, jobs_dir=None, keep_seconds=24 * 3600):
+        self.workers = workers
+        self.jobs_dir = Path(jobs_dir or DEFAULT_JOBS_DIR)
+        self.keep_seconds = keep_seconds
+        self.pool = None
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def job_dir(self, job_id):
+        return self.jobs_dir / job_id
+
+    def create(self):
+        """Reserve a new job id and its directory"""
+        job_id = uuid.uuid4().hex
+        job_dir = self.job_dir(job_id)
+        job_dir.mkdir(parents=True)
+        JobProgress(job_dir).update()
+        return job_id
+
+    def submit(self, job_id, fn, *args):
+        """Queue fn(progress, *args) for job_id; fn and args must be picklable"""
+        with self.lock:
+            self.expire()
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            self.futures[job_id] = self.pool.submit(run_job, str(self.job_dir(job_id)), fn, *args)
+        return job_id
+
+    def complete(self, job_id, html):
+        """Record job_id as done with result html without running anything, e.g. for a cached result"""
+        job_dir = self.job_dir(job_id)
+        (job_dir / RESULT_FILE).write_text(html)
+        progress = JobProgress(job_dir)
+        progress.update(status='done', started=progress.state['created'], finished=time.time())
+        future = Future()
+        future.set_result(None)
+        with self.lock:
+            self.futures[job_id] = future
+        return job_id
+
+    def status(self, job_id):
+        """Status dict of a job, or None for an unknown id"""
+        future = self.futures.get(job_id)
+        if future is None:
+            # not run by this process; its status file is all there is
+            state = read_status(self.job_dir(job_id)) if JOB_ID.fullmatch(job_id) else None
+            return None if state is None else {'id': job_id, **state}
+        state = read_status(self.job_dir(job_id)) or {'status': 'queued', 'stages': []}
+        if future.done() and state['status'] not in ('done', 'failed'):
+            # the worker died before it could record the outcome
+            state.update(status='failed', stage=None, error=repr(future.exception()))
+        return {'id': job_id, **state}
+
+    def result_path(self, job_id):
+        """Path of the finished report, or None while the job is unknown or not done"""
+        state = self.status(job_id)
+        if state is None or state['status'] != 'done':
+            return None
+        return self.job_dir(job_id) / RESULT_FILE
+
+    def expire(self):
+        """Remove finished jobs older than keep_seconds, including those left on disk by other processes"""
+        now = time.time()
+        job_ids = [path.name for path in self.jobs_dir.iterdir()] if self.jobs_dir.exists() else []
+        for job_id in set(job_ids) | set(self.futures):
+            future = self.futures.get(job_id)
+            if future is not None and not future.done():
+                continue
+            state = read_status(self.job_dir(job_id)) or {}
+            if now - (state.get('finished') or now) > self.keep_seconds:
+                self.futures.pop(job_id, None)
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=wait)
+                self.pool = None
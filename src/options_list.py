@@ -1,6 +1,9 @@
 import argparse
+import logging
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 def format_as_annotation(row):
     """Extract ticker, expiration, strike, options_type from a row."""
 
@@ -12,7 +15,11 @@ def format_as_annotation(row):
     }
 
 def annotaions_from_df(df):
+    # skip building the dump entirely when it would not be shown
+    if not logger.isEnabledFor(logging.INFO):
+        return
     annotations = []
+    df = df.assign(expiration=pd.to_datetime(df['expiration']).dt.strftime('%Y-%m-%d'))
     for _, row in df.iterrows():
         data = format_as_annotation(row)
         if data:
@@ -23,7 +30,7 @@ def annotaions_from_df(df):
     
     # Output to terminal
     output = '\n'.join(annotations)
-    print(output)
+    logger.info(output)
 
 def annotations_from_file(csv_file_path):
 
@@ -37,4 +44,5 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse Fidelity CSV to Pine Script annotations format.")
     parser.add_argument("--csv-file", help="Path to the input CSV file")
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     annotations_from_file(args.csv_file)
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""on-disk cache of parsed broker exports keyed by file content"""
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+from pathlib import Path
+import pandas as pd
+from parse_utils import open_source, source_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'pine_scripts' / 'parse'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# parquet needs pyarrow; look for it without paying for the import at startup
+CACHE_FORMAT = 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pkl'
+
+def file_digest(source):
+    """Return the sha256 hex digest of a parser input's contents.
+
+    A file object source is rewound to where it was so the parser can read it next.
+    Text file objects are hashed as the UTF-8 encoding of what they read.
+    """
+    digest = hashlib.sha256()
+    text = hasattr(source, 'read') and isinstance(source.read(0), str)
+    with open_source(source, 'r' if text else 'rb') as f:
+        start = f.tell() if f is source else None
+        for block in iter(lambda: f.read(1024 * 1024), '' if text else b''):
+            digest.update(block.encode() if text else block)
+        if start is not None:
+            f.seek(start)
+    return digest.hexdigest()
+
+class ParseCache(object):
+    """Cache the cleaned stock and options frames produced by a broker parser.
+
+    Entries are keyed on the content hash of the export plus the parser class and
+    its PARSER_VERSION, stored as parquet (pickle without pyarrow), and evicted least
+    recently used first once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def key(self, parser_cls, source):
+        """Build the cache key for a parser class and input file"""
+        version = getattr(parser_cls, 'PARSER_VERSION', 0)
+        return f"{parser_cls.__name__.lower()}-v{version}-{file_digest(source)}"
+
+    def lookup(self, parser_cls, source):
+        """Return (entry, frames) where frames is the cached (stock_df, options_df) or None on a miss"""
+        entry = self.cache_dir / self.key(parser_cls, source)
+        frames = self.read(entry)
+        if frames is not None:
+            logger.info(f"Loaded cached parse of {source_name(source)}")
+        return entry, frames
+
+    def load_or_parse(self, parser_cls, source):
+        """Return (stock_df, options_df) from the cache, parsing and storing them on a miss"""
+        entry, frames = self.lookup(parser_cls, source)
+        if frames is not None:
+            return frames
+
+        parser_obj = parser_cls(source)
+        parser_obj.load()
+        stock_df = parser_obj.stock_df
+        options_df = parser_obj.format_options_data()
+        self.write(entry, stock_df, options_df)
+        return stock_df, options_df
+
+    def read(self, entry):
+        """Read a cached entry, or return None if it is missing or unreadable"""
+        paths = [entry / f'{name}.{CACHE_FORMAT}' for name in ('stock', 'options')]
+        if not all(path.exists() for path in paths):
+            return None
+        try:
+            if CACHE_FORMAT == 'parquet':
+                frames = tuple(pd.read_parquet(path) for path in paths)
+            else:
+                frames = tuple(pd.read_pickle(path) for path in paths)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {entry}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        # mark as recently used for LRU eviction
+        os.utime(entry)
+        return frames
+
+    def write(self, entry, stock_df, options_df):
+        """Store both frames under entry, then evict old entries past the size limit"""
+        tmp_entry = entry.with_name(entry.name + f'.tmp{os.getpid()}')
+        try:
+            tmp_entry.mkdir(parents=True, exist_ok=True)
+            for name, df in (('stock', stock_df), ('options', options_df)):
+                path = tmp_entry / f'{name}.{CACHE_FORMAT}'
+                if CACHE_FORMAT == 'parquet':
+                    df.to_parquet(path)
+                else:
+                    df.to_pickle(path)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+        except Exception as e:
+            logger.warning(f"Could not cache parse results in {entry}: {e}")
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """Return cache entries, least recently used first"""
+        if not self.cache_dir.exists():
+            return []
+        entries = [p for p in self.cache_dir.iterdir() if p.is_dir() and '.tmp' not in p.name]
+        return sorted(entries, key=lambda p: p.stat().st_mtime)
+
+    def entry_size(self, entry):
+        return sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = self.entries()
+        sizes = [self.entry_size(entry) for entry in entries]
+        total = sum(sizes)
+        for entry, size in zip(entries, sizes):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every cached entry"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        logger.info(f"Cleared parse cache at {self.cache_dir}")
@@ -1,7 +1,88 @@
+import io
+import os
+from contextlib import contextmanager
+import pandas as pd
+
+# broker key -> parser class, filled in by the register_parser decorator
+PARSERS = {}
+
+def register_parser(parser_cls):
+    """Class decorator that registers a parser under its BROKER key.
+
+    Parser classes declare BROKER and CONFIG_SECTION, the section of
+    config/harmonization.json holding their column renames.
+    """
+    registered = PARSERS.get(parser_cls.BROKER)
+    if registered is not None and registered.__name__ != parser_cls.__name__:
+        raise ValueError(f"Broker {parser_cls.BROKER} is already registered to {registered.__name__}")
+    PARSERS[parser_cls.BROKER] = parser_cls
+    return parser_cls
+
+def get_parser(broker):
+    """Return the parser class registered for a broker key."""
+    if broker not in PARSERS:
+        raise ValueError(f"No parser registered for broker {broker}; known brokers: {sorted(PARSERS)}")
+    return PARSERS[broker]
+
+@contextmanager
+def open_source(source, mode='r'):
+    """Open a parser input for reading in text ('r') or binary ('rb') mode.
+
+    A source is a path, a bytes buffer or an open file object. Paths are opened
+    and closed here, bytes are read from memory without touching disk, and file
+    objects are read from their current position and left open for the caller.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif not hasattr(source, 'read'):
+        with open(source, mode) as f:
+            yield f
+        return
+    is_binary = isinstance(source.read(0), bytes)
+    if mode == 'rb' and not is_binary:
+        raise TypeError(f"Expected a binary file object, got {type(source).__name__}")
+    if mode == 'rb' or not is_binary:
+        yield source
+        return
+    # decode like open() does; detach afterwards so the caller's file stays open
+    text = io.TextIOWrapper(source)
+    try:
+        yield text
+    finally:
+        text.detach()
+
+def picklable_source(source):
+    """Source that can be sent to a worker process: file objects are read into bytes"""
+    if not hasattr(source, 'read'):
+        return source
+    data = source.read()
+    return data.encode() if isinstance(data, str) else data
+
+def source_name(source):
+    """Printable name of a parser input for logs and stage records"""
+    if isinstance(source, (str, os.PathLike)):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f'<{len(source)} bytes>'
+    return str(getattr(source, 'filename', None) or getattr(source, 'name', None) or f'<{type(source).__name__}>')
+
+MONTH_MAP = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+}
+
 def parse_month(month_str):
     """Convert month abbreviation to number."""
-    month_map = {
-        'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
-        'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
-    }
-    return month_map.get(month_str.upper(), 0)
\ No newline at end of file
+    return MONTH_MAP.get(month_str.upper(), 0)
+
+def format_expiration_columns(month_str, day_str, year_str):
+    """Convert month abbreviation, day and year string columns to YYYY-MM-DD strings.
+
+    Rows that do not form a valid date come back as NaN.
+    """
+    dates = pd.to_datetime(pd.DataFrame({
+        'year': pd.to_numeric(year_str, errors='coerce'),
+        'month': month_str.str.upper().map(MONTH_MAP),
+        'day': pd.to_numeric(day_str, errors='coerce'),
+    }), errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d')
@@ -0,0 +1,162 @@
+"""per-ticker payoff and P&L surfaces over a grid of underlying prices and dates"""
+import logging
+import numpy as np
+import pandas as pd
+from greeks import CONTRACT_MULTIPLIER, DAYS_PER_YEAR, DEFAULT_VOLATILITY, RISK_FREE_RATE, add_greeks, bs_price, leg_kinds
+
+logger = logging.getLogger(__name__)
+
+NUM_PRICES = 121
+NUM_DATES = 6
+# expirations added to the evenly spaced dates, nearest first; the latest is always the last date
+NEAR_EXPIRATIONS = 3
+# the price grid spans at least spot -/+ PRICE_RANGE and every strike -/+ STRIKE_MARGIN
+PRICE_RANGE = 0.5
+STRIKE_MARGIN = 0.2
+# bound on the (legs x dates x prices) float64 temporaries of one chunk
+CHUNK_BYTES = 32 * 1024 * 1024
+# bs_price holds about this many arrays of the chunk shape at once
+PRICING_TEMPORARIES = 12
+
+class PayoffSurface(object):
+    """P&L of one ticker's options (plus its stock) on a dates x prices grid.
+
+    values[i, j] is the change in position value, in dollars, from today's
+    model value if the underlying is at prices[j] on dates[i]; legs past their
+    expiration are worth their intrinsic value. The last date is the latest
+    expiration, so values[-1] is the payoff at expiry of the longest leg.
+    """
+    def __init__(self, ticker, spot, prices, dates, values):
+        self.ticker = ticker
+        self.spot = spot
+        self.prices = prices
+        self.dates = dates
+        self.values = values
+
+    def break_evens(self, row=-1):
+        """Prices where the P&L on dates[row] crosses zero, linearly interpolated"""
+        pnl = self.values[row]
+        sign = np.sign(pnl)
+        crossing = np.flatnonzero(sign[:-1] * sign[1:] < 0)
+        left, right = pnl[crossing], pnl[crossing + 1]
+        prices = self.prices[crossing] + (self.prices[crossing + 1] - self.prices[crossing]) * left / (left - right)
+        # grid points landing exactly on zero
+        return np.union1d(prices, self.prices[pnl == 0])
+
+    def max_loss(self, row=-1):
+        """(loss, price) of the lowest P&L on dates[row]; loss is negative or zero"""
+        j = int(np.argmin(self.values[row]))
+        return min(float(self.values[row, j]), 0.0), float(self.prices[j])
+
+    def max_profit(self, row=-1):
+        j = int(np.argmax(self.values[row]))
+        return max(float(self.values[row, j]), 0.0), float(self.prices[j])
+
+    def unbounded(self, row=-1):
+        """(downside, upside): whether the P&L on dates[row] still falls at the low or high edge of the grid"""
+        pnl = self.values[row]
+        return bool(pnl[0] < pnl[1] and pnl[0] < 0), bool(pnl[-1] < pnl[-2] and pnl[-1] < 0)
+
+def price_grid(spot, strikes, num_prices=NUM_PRICES, price_range=PRICE_RANGE):
+    low = min(spot * (1 - price_range), np.min(strikes) * (1 - STRIKE_MARGIN))
+    high = max(spot * (1 + price_range), np.max(strikes) * (1 + STRIKE_MARGIN))
+    return np.linspace(max(low, 0.0), high, num_prices)
+
+def date_grid(expirations, current_date, num_dates=NUM_DATES, near_expirations=NEAR_EXPIRATIONS):
+    """Evenly spaced dates from current_date to the last expiration, plus the nearest few expirations.
+
+    The grid holds at most num_dates + near_expirations dates however many
+    expirations the legs have, so the pricing cost does not grow with them.
+    """
+    expirations = pd.DatetimeIndex(expirations).dropna()
+    last = max(expirations.max(), current_date)
+    spaced = pd.date_range(current_date, last, periods=num_dates).normalize()
+    upcoming = expirations[expirations >= current_date].unique().sort_values()[:near_expirations]
+    return spaced.union(upcoming).unique().sort_values()
+
+def position_values(prices, years, strike, vol, quantity, is_call, is_forward, rate=RISK_FREE_RATE,
+                    chunk_bytes=CHUNK_BYTES):
+    """Dollar value summed over legs on a (dates x prices) grid.
+
+    years is (legs x dates), the time left on each leg at each date; the other
+    leg arrays are 1-d. Legs are priced in chunks so the broadcast
+    (legs x dates x prices) temporaries stay within chunk_bytes.
+    """
+    num_legs, num_dates = years.shape
+    total = np.zeros((num_dates, len(prices)))
+    per_leg = num_dates * len(prices) * 8 * PRICING_TEMPORARIES
+    step = max(1, chunk_bytes // per_leg)
+    for start in range(0, num_legs, step):
+        legs = slice(start, start + step)
+        values = bs_price(prices[None, None, :], strike[legs, None, None], years[legs, :, None], vol[legs, None, None],
+                          rate, is_call[legs, None, None], is_forward[legs, None, None])
+        total += np.einsum('l,ldp->dp', quantity[legs] * CONTRACT_MULTIPLIER, values)
+    return total
+
+def ticker_surface(ticker, legs, spot, stock_quantity=0.0, current_date=None, num_prices=NUM_PRICES,
+                   num_dates=NUM_DATES, price_range=PRICE_RANGE, rate=RISK_FREE_RATE, chunk_bytes=CHUNK_BYTES,
+                   near_expirations=NEAR_EXPIRATIONS):
+    """PayoffSurface of one ticker's legs (rows of add_greeks or net_legs output) and stock_quantity shares"""
+    current_date = pd.Timestamp(current_date or pd.Timestamp.today()).normalize()
+    strike = legs['strike'].to_numpy(dtype=float)
+    expiration = pd.to_datetime(legs['expiration'])
+    vol = legs['iv'].fillna(DEFAULT_VOLATILITY).to_numpy(dtype=float)
+    quantity = legs['quantity'].to_numpy(dtype=float)
+    is_call, is_forward = leg_kinds(legs['options_type'].astype(str))
+
+    prices = price_grid(spot, strike, num_prices, price_range)
+    dates = date_grid(expiration, current_date, num_dates, near_expirations)
+    # time left per leg per date, then the same at today's date for the reference value
+    days = (expiration.to_numpy()[:, None] - dates.to_numpy()[None, :]) / np.timedelta64(1, 'D')
+    years = np.maximum(days, 0) / DAYS_PER_YEAR
+    today = (np.maximum((expiration - current_date).dt.days.to_numpy(dtype=float), 0) / DAYS_PER_YEAR)[:, None]
+
+    values = position_values(prices, years, strike, vol, quantity, is_call, is_forward, rate, chunk_bytes)
+    now = position_values(np.array([spot]), today, strike, vol, quantity, is_call, is_forward, rate, chunk_bytes)[0, 0]
+    values = values - now + stock_quantity * (prices[None, :] - spot)
+    return PayoffSurface(ticker, spot, prices, dates, values)
+
+def net_legs(legs_df):
+    """Sum the quantity of legs that price the same (same ticker, type, strike, expiration and vol).
+
+    Legs that differ only in account or broker collapse into one, so the grid is
+    priced once per distinct contract.
+    """
+    legs_df = legs_df.assign(ticker=legs_df['ticker'].astype(str), options_type=legs_df['options_type'].astype(str),
+                             iv=legs_df['iv'].fillna(DEFAULT_VOLATILITY))
+    keys = ['ticker', 'options_type', 'strike', 'expiration', 'iv', 'underlying price']
+    return legs_df.groupby(keys, sort=False, dropna=False, as_index=False)['quantity'].sum()
+
+def payoff_surfaces(options_df, stocks_df=None, prices=None, current_date=None, **grid):
+    """Yield a PayoffSurface per ticker with options, stock included; SYN_LONG rows price as forwards.
+
+    grid holds ticker_surface keywords (num_prices, num_dates, price_range...).
+    Tickers without an underlying price are skipped.
+    """
+    current_date = pd.Timestamp(current_date or pd.Timestamp.today()).normalize()
+    legs_df = net_legs(add_greeks(options_df, stocks_df, prices, current_date))
+    shares = pd.Series(dtype=float)
+    if stocks_df is not None and not stocks_df.empty:
+        shares = stocks_df.groupby(stocks_df['ticker'].astype(str))['quantity'].sum()
+    missing = []
+    for ticker, legs in legs_df.groupby('ticker'):
+        spot = legs['underlying price'].iloc[0]
+        if np.isnan(spot):
+            missing.append(ticker)
+            continue
+        yield ticker_surface(ticker, legs, spot, shares.get(ticker, 0.0), current_date, **grid)
+    if missing:
+        logger.info(f"No underlying price for {', '.join(missing)}; skipped their payoff surfaces")
+
+def payoff_summary(surfaces):
+    """Break-evens, max loss and max profit at the last expiration, one row per ticker"""
+    rows = []
+    for surface in surfaces:
+        loss, loss_price = surface.max_loss()
+        profit, profit_price = surface.max_profit()
+        downside, upside = surface.unbounded()
+        rows.append({'ticker': surface.ticker, 'spot': surface.spot, 'expiration': surface.dates[-1],
+                     'break evens': np.round(surface.break_evens(), 2).tolist(),
+                     'max loss': loss, 'max loss price': loss_price, 'max profit': profit,
+                     'max profit price': profit_price, 'loss beyond grid': downside or upside})
+    return pd.DataFrame(rows)
@@ -0,0 +1,59 @@
+"""data preparation shared by the matplotlib and interactive report backends"""
+import numpy as np
+import pandas as pd
+
+# positions below this percent of the portfolio are pooled in the allocation chart
+SMALL_POSITION_PCT = 2.0
+# days to expiration splitting the short and long dated expiration panels
+SHORT_DATED_DTE = 60
+SHORT_DTE_TICKS = np.linspace(0, SHORT_DATED_DTE, num=10, dtype=int)
+LONG_DTE_TICKS = [60, 90, 120, 180, 270, 360, 540, 720]
+
+def current_values(stocks_df):
+    """Stock positions sorted by current value, largest first"""
+    return stocks_df.sort_values('current value', ascending=False)
+
+def allocation_split(stocks_df, sm_pos_pct=SMALL_POSITION_PCT):
+    """Return (large, small) current value per ticker; large gets a 'Small Positions' slice when small is non-empty"""
+    # Pie chart: Portfolio allocation by ticker (stocks + options current value)
+    combined_allocation = pd.concat([
+        stocks_df.groupby('ticker', observed=True)['current value'].sum(),
+        #options_df.groupby('ticker')['current value'].sum()
+    ], axis=1).sum(axis=1, skipna=True)
+    combined_allocation.index = combined_allocation.index.astype(str)
+
+    total_value = combined_allocation.sum()
+    small_positions = combined_allocation[combined_allocation/total_value < sm_pos_pct/100]
+    large_positions = combined_allocation[combined_allocation/total_value >= sm_pos_pct/100]
+
+    # Add small positions as a single slice
+    if not small_positions.empty:
+        large_positions['Small Positions'] = small_positions.sum()
+    return large_positions, small_positions
+
+def ticker_groups(options_df, current_date):
+    """Yield (ticker, group) per ticker with expiration_date and DTE columns added"""
+    for ticker, group in options_df.groupby("ticker", observed=True):
+        if group.empty:
+            continue
+        group = group.copy()
+        group['expiration_date'] = pd.to_datetime(group['expiration'])
+        group['DTE'] = (group['expiration_date'] - current_date).dt.days
+        yield ticker, group
+
+def type_exposure(group, types):
+    """Net current value per option type, in types order"""
+    return group.groupby("options_type", observed=True)["current value"].sum().reindex(types).fillna(0)
+
+def strike_ladder(group, types):
+    """Current value per strike (rows, ascending) and option type (columns, in types order)"""
+    strike_group = group.groupby(["strike", "options_type"], observed=True)["current value"].sum().unstack(fill_value=0)
+    return strike_group.reindex(columns=types).fillna(0).sort_index()
+
+def exposure_limit(group):
+    """Half-height of the symmetric y-range of the exposure charts"""
+    return max(abs(group['current value'].min()), group['current value'].max()) * 1.1
+
+def dte_split(group):
+    """Return the (short dated, long dated) rows of a group with a DTE column"""
+    return group[group['DTE'] < SHORT_DATED_DTE], group[group['DTE'] >= SHORT_DATED_DTE]
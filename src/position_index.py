@@ -0,0 +1,82 @@
+"""in-memory indexes over one positions snapshot for filtered, paginated lookups"""
+import numpy as np
+import pandas as pd
+
+# columns looked up by exact value; the option type column is 'options_type' for options and 'type' for stocks
+HASH_COLUMNS = ('ticker', 'account', 'broker', 'type', 'options_type')
+RANGE_COLUMN = 'expiration'
+
+def json_column(values):
+    """Column as a list of JSON-ready values: dates as ISO strings, NaN/NaT as None"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [None if pd.isna(v) else v.isoformat() for v in values]
+    values = values.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+class FrameIndex(object):
+    """Indexes over one frame, built once.
+
+    Every HASH_COLUMNS column present gets a dict of value -> sorted row numbers,
+    and the expiration column a sorted index (row order plus sorted values) so a
+    date range is two binary searches. Rows are kept as JSON-ready column lists
+    so a page is materialized without touching the frame again.
+    """
+    def __init__(self, df):
+        df = df.reset_index(drop=True)
+        self.size = len(df)
+        self.fields = list(df.columns)
+        self.columns = {col: json_column(df[col]) for col in self.fields}
+        self.hash_indexes = {col: {str(value): rows for value, rows in df.groupby(col, observed=True).indices.items()}
+                             for col in HASH_COLUMNS if col in df.columns}
+        self.range_order = self.range_values = None
+        if RANGE_COLUMN in df.columns:
+            values = df[RANGE_COLUMN].to_numpy(dtype='datetime64[ns]')
+            # NaT sorts last, so it falls outside every range
+            self.range_order = np.argsort(values, kind='stable')
+            self.range_values = values[self.range_order]
+
+    def lookup(self, column, values):
+        """Sorted row numbers whose column holds any of values"""
+        index = self.hash_indexes[column]
+        rows = [index[value] for value in values if value in index]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp)
+
+    def range(self, start=None, end=None):
+        """Sorted row numbers with start <= expiration <= end (either bound optional)"""
+        lo = 0 if start is None else np.searchsorted(self.range_values, np.datetime64(start, 'ns'), side='left')
+        if end is None:
+            hi = len(self.range_values) - np.isnat(self.range_values).sum()
+        else:
+            hi = np.searchsorted(self.range_values, np.datetime64(end, 'ns'), side='right')
+        return np.sort(self.range_order[lo:hi])
+
+    def query(self, filters=None, start=None, end=None):
+        """Row numbers, in frame order, matching every filter ({column: [values]}) and the expiration range"""
+        rows = None
+        for column, values in (filters or {}).items():
+            matched = self.lookup(column, values)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        if start is not None or end is not None:
+            matched = self.range(start, end)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return np.arange(self.size) if rows is None else rows
+
+    def records(self, rows, fields=None):
+        """Rows as a list of dicts holding fields (default all)"""
+        columns = [(field, self.columns[field]) for field in (fields or self.fields)]
+        return [{field: values[row] for field, values in columns} for row in rows.tolist()]
+
+class PositionIndex(object):
+    """FrameIndex for the stocks and options of one snapshot, tagged with its id"""
+    def __init__(self, snapshot_id, stocks_df, options_df):
+        self.snapshot_id = snapshot_id
+        self.frames = {'stocks': FrameIndex(stocks_df), 'options': FrameIndex(options_df)}
+
+    @classmethod
+    def from_store(cls, store):
+        """Index the latest snapshot in a SnapshotStore, or return None when it is empty"""
+        snapshot_id = store.latest_id()
+        if snapshot_id is None:
+            return None
+        stocks_df, options_df = store.snapshot(snapshot_id)
+        return cls(snapshot_id, stocks_df, options_df)
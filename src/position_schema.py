@@ -0,0 +1,59 @@
+"""dtypes for the harmonized stock and option columns in config/harmonization.json"""
+import pandas as pd
+
+STOCK_DTYPES = {
+    'broker': 'category',
+    'account': 'category',
+    'ticker': 'category',
+    'quantity': 'float64',
+    'last price': 'float64',
+    'type': 'category',
+    'current value': 'float64',
+    'cost basis': 'float64',
+    'gain loss': 'float64',
+}
+
+OPTION_DTYPES = {
+    'broker': 'category',
+    'account': 'category',
+    'ticker': 'category',
+    'quantity': 'int32',
+    'options_type': 'category',
+    'expiration': 'datetime64[ns]',
+    'strike': 'float64',
+    'last price': 'float64',
+    'current value': 'float64',
+    'cost basis': 'float64',
+    'gain loss': 'float64',
+}
+
+def enforce_schema(df, dtypes, name='positions'):
+    """Validate that df has exactly the schema columns and coerce each one to its dtype.
+
+    Values that cannot be converted raise a ValueError naming the column and the
+    offending values, so bad broker data fails at ingest rather than at plot time.
+    """
+    missing = [col for col in dtypes if col not in df.columns]
+    extra = [col for col in df.columns if col not in dtypes]
+    if missing or extra:
+        raise ValueError(f"{name} columns do not match the schema: missing {missing}, unexpected {extra}")
+
+    columns = {}
+    for col, dtype in dtypes.items():
+        values = df[col]
+        if dtype == 'category':
+            columns[col] = values.astype('category')
+            continue
+        if dtype.startswith('datetime64'):
+            converted = pd.to_datetime(values, errors='coerce', format='ISO8601')
+            bad = values.notna() & converted.isna()
+        else:
+            converted = pd.to_numeric(values, errors='coerce')
+            bad = values.notna() & converted.isna()
+            if pd.api.types.is_integer_dtype(dtype):
+                # integer columns cannot hold NaN or fractions
+                bad |= converted.isna() | (converted != converted.round())
+        if bad.any():
+            raise ValueError(f"{name} column '{col}' has values that are not {dtype}: {values[bad].unique()[:5].tolist()}")
+        columns[col] = converted.astype(dtype)
+    return pd.DataFrame(columns, index=df.index)
@@ -0,0 +1,63 @@
+"""incremental html report writer with a manifest of completed sections"""
+import os
+from pathlib import Path
+
+class ReportWriter(object):
+    """Write an html report one section at a time, flushing each to disk.
+
+    Sections go to <name>.partial, which replaces the report only once every
+    section is written. Alongside it a manifest lists the report fingerprint and
+    the name of each section flushed so far; if a run stops part way the manifest
+    stays behind and a later run with the same fingerprint can find the completed
+    sections in `completed` and reuse their stored html instead of rendering them.
+    """
+    def __init__(self, path, fingerprint, header='<html><body>', footer='</body></html>'):
+        self.path = Path(path)
+        self.partial_path = self.path.with_name(self.path.name + '.partial')
+        self.manifest_path = self.path.with_name(self.path.name + '.manifest')
+        self.fingerprint = fingerprint
+        self.header = header
+        self.footer = footer
+        self.completed = self.resumable()
+        self.file = None
+        self.manifest = None
+
+    def resumable(self):
+        """Names of the sections an interrupted write of the same report completed"""
+        try:
+            lines = self.manifest_path.read_text().splitlines()
+        except OSError:
+            return set()
+        if not lines or lines[0] != self.fingerprint:
+            return set()
+        return set(lines[1:])
+
+    def __enter__(self):
+        self.file = open(self.partial_path, 'w')
+        # the manifest is appended to, one line per section
+        self.manifest = open(self.manifest_path, 'w')
+        self.manifest.write(self.fingerprint + '\n')
+        self.write(self.header)
+        return self
+
+    def write(self, html):
+        self.file.write(html)
+        self.file.flush()
+
+    def write_section(self, name, html):
+        """Flush one section and record it as completed"""
+        self.write(html)
+        self.manifest.write(name + '\n')
+        self.manifest.flush()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.manifest.close()
+        if exc_type is None:
+            self.file.write(self.footer)
+            self.file.close()
+            os.replace(self.partial_path, self.path)
+            self.manifest_path.unlink()
+        else:
+            # keep the partial report and its manifest so the next run can resume
+            self.file.close()
+        return False
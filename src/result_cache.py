@@ -0,0 +1,130 @@
+"""on-disk cache of whole web update results keyed by the uploaded files and config"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+import pandas as pd
+from config_loader import config_dir, load_config
+from parse_cache import CACHE_FORMAT, file_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'pine_scripts' / 'results'
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 6 * 3600
+
+# config files that change the harmonized frames or the report
+CONFIG_NAMES = ('harmonization', 'visualization')
+
+def result_key(sources, *context):
+    """Content hash of the uploaded sources, the config files and context (code version, date).
+
+    The config is hashed as load_config returns it, i.e. as this process uses it.
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(file_digest(source).encode())
+    for name in CONFIG_NAMES:
+        path = config_dir() / f'{name}.json'
+        digest.update(json.dumps(load_config(name), sort_keys=True).encode() if path.exists() else b'')
+    digest.update(repr(context).encode())
+    return digest.hexdigest()
+
+class ResultCache(object):
+    """Cache the harmonized frames and report files of a complete update.
+
+    An entry is a directory named by result_key holding the stock, options and
+    raw option legs frames plus named files (plots.html, the expiring options html and csv...).
+    Entries older than ttl_seconds are dropped, and least recently used ones are
+    evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+    def frame_paths(self, entry):
+        return [entry / f'{name}.{CACHE_FORMAT}' for name in ('stock', 'options', 'legs')]
+
+    def expired(self, entry):
+        # the frames are written once, so their mtime is the entry's creation time
+        try:
+            created = self.frame_paths(entry)[0].stat().st_mtime
+        except OSError:
+            return True
+        return time.time() - created > self.ttl_seconds
+
+    def read(self, key):
+        """Return (stocks_df, options_df, legs_df, entry directory) for key, or None on a miss"""
+        entry = self.cache_dir / key
+        if not entry.is_dir() or self.expired(entry):
+            return None
+        try:
+            if CACHE_FORMAT == 'parquet':
+                stocks_df, options_df, legs_df = (pd.read_parquet(path) for path in self.frame_paths(entry))
+            else:
+                stocks_df, options_df, legs_df = (pd.read_pickle(path) for path in self.frame_paths(entry))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable result cache entry {entry}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        # mark as recently used for LRU eviction
+        os.utime(entry)
+        return stocks_df, options_df, legs_df, entry
+
+    def write(self, key, stocks_df, options_df, legs_df, files=(), texts=None):
+        """Store the frames, copies of files and texts ({name: str}) under key, then evict"""
+        entry = self.cache_dir / key
+        tmp_entry = entry.with_name(entry.name + f'.tmp{os.getpid()}')
+        try:
+            tmp_entry.mkdir(parents=True, exist_ok=True)
+            for path, df in zip(self.frame_paths(tmp_entry), (stocks_df, options_df, legs_df)):
+                if CACHE_FORMAT == 'parquet':
+                    df.to_parquet(path)
+                else:
+                    df.to_pickle(path)
+            for path in files:
+                shutil.copyfile(path, tmp_entry / Path(path).name)
+            for name, text in (texts or {}).items():
+                (tmp_entry / name).write_text(text)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+        except Exception as e:
+            logger.warning(f"Could not cache results in {entry}: {e}")
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        """Return cache entries, least recently used first"""
+        if not self.cache_dir.exists():
+            return []
+        entries = [p for p in self.cache_dir.iterdir() if p.is_dir() and '.tmp' not in p.name]
+        return sorted(entries, key=lambda p: p.stat().st_mtime)
+
+    def entry_size(self, entry):
+        return sum(p.stat().st_size for p in entry.iterdir() if p.is_file())
+
+    def evict(self):
+        """Remove expired entries, then least recently used ones until the cache fits in max_bytes"""
+        entries = []
+        for entry in self.entries():
+            if self.expired(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                entries.append(entry)
+        sizes = [self.entry_size(entry) for entry in entries]
+        total = sum(sizes)
+        for entry, size in zip(entries, sizes):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Remove every cached result"""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        logger.info(f"Cleared result cache at {self.cache_dir}")
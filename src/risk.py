@@ -0,0 +1,200 @@
+"""portfolio shock grids and Monte Carlo value at risk over stocks and options from every broker"""
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from greeks import (CONTRACT_MULTIPLIER, DAYS_PER_YEAR, DEFAULT_VOLATILITY, IV_BOUNDS, RISK_FREE_RATE, add_greeks,
+                    bs_price, leg_kinds, underlying_prices)
+from payoff import CHUNK_BYTES, PRICING_TEMPORARIES
+
+logger = logging.getLogger(__name__)
+
+# moves applied to every underlying at once, and absolute shifts of every implied volatility
+PRICE_SHOCKS = np.round(np.linspace(-0.2, 0.2, 9), 2)
+VOL_SHIFTS = (-0.10, 0.0, 0.10)
+
+HORIZON_DAYS = 10
+CONFIDENCE = 0.99
+NUM_PATHS = 20000
+BATCH_SIZE = 2000
+SEED = 0
+# pairwise correlation of underlying returns when no correlation matrix is supplied
+DEFAULT_CORRELATION = 0.5
+
+class Book(object):
+    """Every stock and option position as flat arrays priced in one call.
+
+    Stocks are forwards struck at zero (worth the spot), SYN_LONG rows are
+    forwards at their strike, and every other leg is a Black-Scholes call or put
+    at its implied volatility. Positions that price the same (one contract held
+    in several accounts, every stock row of a ticker) are netted into one.
+    Positions are mapped to columns of `tickers`, so a scenario is just a matrix
+    of underlying prices (scenarios x tickers); they are priced in chunks so the
+    (scenarios x positions) temporaries stay within chunk_bytes.
+    """
+    def __init__(self, stocks_df, options_df, prices=None, current_date=None, rate=RISK_FREE_RATE,
+                 chunk_bytes=CHUNK_BYTES):
+        self.rate = rate
+        self.chunk_bytes = chunk_bytes
+        spots = underlying_prices(stocks_df, prices)
+        legs = add_greeks(options_df, stocks_df, prices, current_date, rate)
+        is_call, is_forward = leg_kinds(legs['options_type'].astype(str))
+        positions = pd.concat([
+            pd.DataFrame({'ticker': legs['ticker'].astype(str), 'spot': legs['underlying price'],
+                          'strike': legs['strike'], 'years': np.maximum(legs['dte'], 0) / DAYS_PER_YEAR,
+                          'vol': legs['iv'].fillna(DEFAULT_VOLATILITY), 'is_call': is_call, 'is_forward': is_forward,
+                          'shares': legs['quantity'].astype(float) * CONTRACT_MULTIPLIER}),
+            pd.DataFrame({'ticker': stocks_df['ticker'].astype(str), 'strike': 0.0, 'years': 0.0,
+                          'vol': DEFAULT_VOLATILITY, 'is_call': False, 'is_forward': True,
+                          'shares': stocks_df['quantity'].astype(float)}).assign(
+                              spot=lambda df: df['ticker'].map(spots)),
+        ], ignore_index=True)
+        unpriced = positions['spot'].isna()
+        if unpriced.any():
+            logger.info(f"No underlying price for {sorted(set(positions.loc[unpriced, 'ticker']))}; left out of the risk numbers")
+            positions = positions[~unpriced]
+        # each underlying moves with the median implied volatility of its option legs
+        ticker_vols = positions[~positions['is_forward']].groupby('ticker')['vol'].median()
+        positions = positions.groupby(['ticker', 'spot', 'strike', 'years', 'vol', 'is_call', 'is_forward'],
+                                      as_index=False)['shares'].sum()
+
+        self.tickers, self.column = np.unique(positions['ticker'].to_numpy(dtype=str), return_inverse=True)
+        self.spots = positions.groupby('ticker')['spot'].first().reindex(self.tickers).to_numpy()
+        self.vols = ticker_vols.reindex(self.tickers).fillna(DEFAULT_VOLATILITY).to_numpy()
+        for name in ('strike', 'years', 'vol', 'shares'):
+            setattr(self, name, positions[name].to_numpy(dtype=float))
+        self.is_call = positions['is_call'].to_numpy(dtype=bool)
+        self.is_forward = positions['is_forward'].to_numpy(dtype=bool)
+        self.base_values = self.position_values(self.spots[None, :])[0]
+
+    def __len__(self):
+        return len(self.shares)
+
+    def position_values(self, spots, vol_shift=0.0, days=0, positions=slice(None)):
+        """Dollar value of the positions (scenarios x positions) for spots (scenarios x tickers), days ahead"""
+        years = np.maximum(self.years[positions] - days / DAYS_PER_YEAR, 0)
+        vol = np.clip(self.vol[positions] + vol_shift, IV_BOUNDS[0], None)
+        return self.shares[positions] * bs_price(spots[:, self.column[positions]], self.strike[positions], years, vol,
+                                                 self.rate, self.is_call[positions], self.is_forward[positions])
+
+    def chunks(self, num_scenarios):
+        """Slices of the positions small enough to price num_scenarios at once within chunk_bytes"""
+        step = max(1, self.chunk_bytes // (num_scenarios * 8 * PRICING_TEMPORARIES))
+        return [slice(start, start + step) for start in range(0, len(self), step)]
+
+    def pnl(self, spots, vol_shift=0.0, days=0):
+        """Portfolio P&L per scenario against today's value"""
+        total = np.zeros(len(spots))
+        for chunk in self.chunks(len(spots)):
+            total += self.position_values(spots, vol_shift, days, chunk).sum(axis=1) - self.base_values[chunk].sum()
+        return total
+
+    def ticker_pnl(self, spots, vol_shift=0.0, days=0):
+        """P&L per scenario per ticker (scenarios x tickers)"""
+        total = np.zeros((len(spots), len(self.tickers)))
+        for chunk in self.chunks(len(spots)):
+            change = self.position_values(spots, vol_shift, days, chunk) - self.base_values[chunk]
+            total += change @ np.eye(len(self.tickers))[self.column[chunk]]
+        return total
+
+def shock_grid(book, shocks=PRICE_SHOCKS, vol_shifts=VOL_SHIFTS):
+    """Portfolio P&L with every underlying moved by each shock (rows) and every vol shifted (columns)"""
+    spots = book.spots[None, :] * (1 + np.asarray(shocks))[:, None]
+    return pd.DataFrame({shift: book.pnl(spots, shift) for shift in vol_shifts}, index=pd.Index(shocks, name='shock'))
+
+def ticker_shocks(book, shocks=PRICE_SHOCKS):
+    """P&L of each ticker's positions (rows) when its underlying alone moves by each shock (columns)"""
+    spots = book.spots[None, :] * (1 + np.asarray(shocks))[:, None]
+    # a ticker's positions only depend on its own underlying, so moving all at once gives the same per-ticker numbers
+    return pd.DataFrame(book.ticker_pnl(spots).T, index=pd.Index(book.tickers, name='ticker'), columns=shocks)
+
+def correlation_matrix(tickers, correlation=DEFAULT_CORRELATION):
+    """Correlation of the tickers' returns: a constant pairwise value or a ticker-indexed DataFrame.
+
+    Tickers missing from a DataFrame get DEFAULT_CORRELATION with the others.
+    """
+    base = DEFAULT_CORRELATION if isinstance(correlation, pd.DataFrame) else float(correlation)
+    matrix = np.full((len(tickers), len(tickers)), base)
+    if isinstance(correlation, pd.DataFrame):
+        known = correlation.reindex(index=tickers, columns=tickers)
+        matrix = np.where(known.notna(), known.to_numpy(dtype=float), matrix)
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+def cholesky(matrix):
+    """Lower Cholesky factor, clipping negative eigenvalues first if the matrix is not positive definite"""
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(matrix)
+        fixed = vectors @ np.diag(np.clip(values, 1e-8, None)) @ vectors.T
+        scale = np.sqrt(np.diag(fixed))
+        return np.linalg.cholesky(fixed / np.outer(scale, scale))
+
+def simulate_batch(book, factor, seed, size, horizon_days=HORIZON_DAYS):
+    """P&L of size correlated lognormal scenarios of the underlyings horizon_days ahead"""
+    rng = np.random.default_rng(seed)
+    years = horizon_days / DAYS_PER_YEAR
+    shocks = rng.standard_normal((size, len(book.tickers))) @ factor.T
+    log_returns = -0.5 * book.vols ** 2 * years + book.vols * np.sqrt(years) * shocks
+    return book.pnl(book.spots * np.exp(log_returns), days=horizon_days)
+
+class MonteCarloResult(object):
+    """Simulated portfolio P&L with its value at risk and expected shortfall (both as positive losses)"""
+    def __init__(self, pnl, confidence, horizon_days):
+        self.pnl = pnl
+        self.confidence = confidence
+        self.horizon_days = horizon_days
+        self.var = max(0.0, -float(np.quantile(pnl, 1 - confidence)))
+        tail = pnl[pnl <= -self.var]
+        self.expected_shortfall = max(0.0, -float(tail.mean())) if len(tail) else self.var
+
+def monte_carlo(book, num_paths=NUM_PATHS, batch_size=BATCH_SIZE, seed=SEED, workers=1, correlation=DEFAULT_CORRELATION,
+                horizon_days=HORIZON_DAYS, confidence=CONFIDENCE):
+    """Simulate num_paths scenarios in batches and return a MonteCarloResult.
+
+    Each batch draws from its own child of SeedSequence(seed), so the result is
+    the same for any number of workers. With workers != 1 batches run in a
+    process pool, at most a few per worker in flight; only each batch's P&L
+    vector is kept, so memory is bounded by the batch size, not num_paths.
+    """
+    factor = cholesky(correlation_matrix(book.tickers, correlation))
+    sizes = [min(batch_size, num_paths - start) for start in range(0, num_paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    pnl = np.empty(num_paths)
+    offset = 0
+    if workers == 1 or len(sizes) == 1:
+        for child, size in zip(seeds, sizes):
+            pnl[offset:offset + size] = simulate_batch(book, factor, child, size, horizon_days)
+            offset += size
+        return MonteCarloResult(pnl, confidence, horizon_days)
+
+    ahead = 2 * (workers or os.cpu_count())
+    window = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for child, size in zip(seeds, sizes):
+            window.append(pool.submit(simulate_batch, book, factor, child, size, horizon_days))
+            if len(window) >= ahead:
+                batch = window.popleft().result()
+                pnl[offset:offset + len(batch)] = batch
+                offset += len(batch)
+        while window:
+            batch = window.popleft().result()
+            pnl[offset:offset + len(batch)] = batch
+            offset += len(batch)
+    return MonteCarloResult(pnl, confidence, horizon_days)
+
+def portfolio_risk(stocks_df, options_df, prices=None, current_date=None, workers=1, **simulation):
+    """Book, shock grid, per-ticker shocks and Monte Carlo result for the harmonized frames.
+
+    simulation holds monte_carlo keywords (num_paths, seed, correlation...).
+    """
+    book = Book(stocks_df, options_df, prices, current_date)
+    return {
+        'book': book,
+        'shock_grid': shock_grid(book),
+        'ticker_shocks': ticker_shocks(book),
+        'monte_carlo': monte_carlo(book, workers=workers, **simulation),
+    }
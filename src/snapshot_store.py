@@ -0,0 +1,86 @@
+"""date-partitioned parquet store of harmonized position snapshots"""
+import logging
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('stocks', 'options')
+# option legs before synthetic longs are folded in, kept for incremental diffs
+LEGS = 'legs'
+
+class SnapshotStore(object):
+    """Append-only store with one parquet file per kind per harmonization run.
+
+    Layout: <root>/<stocks|options|legs>/date=YYYY-MM-DD/<snapshot id>.parquet, where the
+    snapshot id sorts by time. Every row also carries its snapshot timestamp in the
+    'snapshot' column so history queries can tell runs apart within a day.
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def write(self, stocks_df, options_df, timestamp=None, legs_df=None):
+        """Store one snapshot of both frames (and optionally the raw legs) and return its snapshot id"""
+        timestamp = timestamp or datetime.now()
+        snapshot_id = timestamp.strftime('%Y%m%dT%H%M%S%f')
+        frames = {'stocks': stocks_df, 'options': options_df, LEGS: legs_df}
+        for kind, df in frames.items():
+            if df is None:
+                continue
+            partition = self.root / kind / f"date={timestamp.strftime('%Y-%m-%d')}"
+            partition.mkdir(parents=True, exist_ok=True)
+            df = df.assign(snapshot=pd.Timestamp(timestamp))
+            df.to_parquet(partition / f'{snapshot_id}.parquet', index=False)
+        logger.info(f"Stored snapshot {snapshot_id} in {self.root}")
+        return snapshot_id
+
+    def snapshots(self, kind='options'):
+        """Return the paths of every stored snapshot file for kind, oldest first"""
+        return sorted((self.root / kind).glob('date=*/*.parquet'), key=lambda p: p.stem)
+
+    def latest_id(self):
+        """Id of the most recent snapshot, or None when the store is empty"""
+        paths = self.snapshots('options')
+        return paths[-1].stem if paths else None
+
+    def latest(self, kinds=KINDS):
+        """Return one frame per kind from the most recent snapshot, None where it has no such file"""
+        snapshot_id = self.latest_id()
+        if snapshot_id is None:
+            return tuple(None for _ in kinds)
+        return self.snapshot(snapshot_id, kinds)
+
+    def snapshot(self, snapshot_id, kinds=KINDS):
+        """Return one frame per kind from the given snapshot, None where it has no such file"""
+        partition = f"date={snapshot_id[:4]}-{snapshot_id[4:6]}-{snapshot_id[6:8]}"
+        frames = []
+        for kind in kinds:
+            path = self.root / kind / partition / f'{snapshot_id}.parquet'
+            frames.append(pd.read_parquet(path).drop(columns=['snapshot']) if path.exists() else None)
+        return tuple(frames)
+
+    def read(self, kind='options', tickers=None, brokers=None, start_date=None, end_date=None):
+        """Read stored rows of kind across snapshots, pushing the filters down to the dataset.
+
+        Parameters:
+        - kind: 'stocks', 'options' or 'legs'
+        - tickers, brokers: list of values to keep, or None for all
+        - start_date, end_date: 'YYYY-MM-DD' bounds (inclusive) on the snapshot date
+        """
+        if kind not in KINDS + (LEGS,):
+            raise ValueError(f"Unknown snapshot kind {kind}; expected one of {KINDS + (LEGS,)}")
+        filters = []
+        if tickers is not None:
+            filters.append(('ticker', 'in', list(tickers)))
+        if brokers is not None:
+            filters.append(('broker', 'in', list(brokers)))
+        if start_date is not None:
+            filters.append(('date', '>=', str(start_date)))
+        if end_date is not None:
+            filters.append(('date', '<=', str(end_date)))
+        if not self.snapshots(kind):
+            return pd.DataFrame()
+        df = pd.read_parquet(self.root / kind, filters=filters or None)
+        df['date'] = df['date'].astype(str)
+        return df.sort_values('snapshot', kind='stable').reset_index(drop=True)
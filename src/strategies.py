@@ -0,0 +1,250 @@
+"""vectorized detection of multi-leg option strategies"""
+import numpy as np
+import pandas as pd
+from incremental import OPTION_KEYS, STOCK_KEYS
+
+KEYS = ['ticker', 'expiration']
+STRATEGY_COLUMNS = ['strategy', 'ticker', 'expiration', 'strikes', 'quantity', 'leg_ids', 'stock_ids', 'leg_keys',
+                    'stock_keys', 'legs']
+# columns written to strategies.csv; leg_ids/stock_ids are row positions and only mean something in memory
+STORED_STRATEGY_COLUMNS = [column for column in STRATEGY_COLUMNS if column not in ('leg_ids', 'stock_ids')]
+
+def option_legs(options_df):
+    """Return the option legs with a positional leg_id and call/put, long/short flags."""
+    legs = options_df.reset_index(drop=True)
+    legs = legs.assign(leg_id=np.arange(len(legs)))
+    legs = legs.dropna(subset=KEYS + ['strike'])
+    options_type = legs['options_type'].astype(str)
+    legs['right'] = options_type.str[-1]
+    legs['side'] = options_type.str[0]
+    return legs
+
+def row_keys(df, keys):
+    """Key tuple of every row (OPTION_KEYS or STOCK_KEYS), stable across runs and files, with dates as ISO strings"""
+    columns = []
+    for key in keys:
+        values = df[key]
+        if key == 'expiration':
+            values = pd.to_datetime(values).dt.strftime('%Y-%m-%d')
+        columns.append(values.astype(object).tolist())
+    return list(zip(*columns))
+
+def pair_legs(legs, first_type, second_type, same_strike, nearest=True, strike_order=None):
+    """Pair legs of two option types that share ticker and expiration.
+
+    With same_strike the legs must share a strike; otherwise each first leg is paired
+    greedily with the nearest-strike second leg. strike_order '<' or '>' requires the
+    first leg's strike to be below or above the second's.
+    """
+    first = legs[legs['options_type'] == first_type]
+    second = legs[legs['options_type'] == second_type]
+    on = KEYS + ['strike'] if same_strike else KEYS
+    pairs = first.merge(second, on=on, suffixes=('_1', '_2'))
+    if same_strike:
+        pairs['strike_1'] = pairs['strike_2'] = pairs['strike']
+    if strike_order == '<':
+        pairs = pairs[pairs['strike_1'] < pairs['strike_2']]
+    elif strike_order == '>':
+        pairs = pairs[pairs['strike_1'] > pairs['strike_2']]
+    if nearest:
+        # greedy one-to-one matching, closest strikes first
+        pairs = pairs.assign(distance=(pairs['strike_1'] - pairs['strike_2']).abs())
+        pairs = pairs.sort_values(['distance', 'leg_id_1', 'leg_id_2'], kind='stable')
+        pairs = pairs.drop_duplicates('leg_id_1').drop_duplicates('leg_id_2')
+    return pairs.sort_values(KEYS + ['strike_1', 'strike_2'], kind='stable')
+
+def pair_strategy(pairs, strategy):
+    """Format matched leg pairs as rows of the strategy table."""
+    quantity = np.minimum(pairs['quantity_1'].abs(), pairs['quantity_2'].abs())
+    return pd.DataFrame({
+        'strategy': strategy,
+        'ticker': pairs['ticker'].values,
+        'expiration': pairs['expiration'].values,
+        'strikes': list(zip(pairs['strike_1'], pairs['strike_2'])),
+        'quantity': quantity.values,
+        'leg_ids': list(zip(pairs['leg_id_1'], pairs['leg_id_2'])),
+        'stock_ids': [()] * len(pairs),
+        'legs': (pairs['options_type_1'].astype(str) + ' ' + pairs['strike_1'].astype(str) + ' / '
+                 + pairs['options_type_2'].astype(str) + ' ' + pairs['strike_2'].astype(str)).values,
+    })
+
+def synthetic_long_pairs(legs):
+    """Match the first LC and first SP of each ticker/expiration/strike, as process_synthetics does."""
+    lc = legs[legs['options_type'] == 'LC'].drop_duplicates(KEYS + ['strike'])
+    sp = legs[legs['options_type'] == 'SP'].drop_duplicates(KEYS + ['strike'])
+    pairs = pair_legs(pd.concat([lc, sp]), 'LC', 'SP', same_strike=True, nearest=False)
+    return pairs[(pairs['quantity_1'] > 0) & (pairs['quantity_2'] < 0)]
+
+def synthetic_longs(legs, stocks_df):
+    return pair_strategy(synthetic_long_pairs(legs), 'SYN_LONG')
+
+def paired(strategy, first_type, second_type, same_strike, strike_order=None):
+    """Rule pairing first_type with second_type legs of the same ticker and expiration into strategy rows"""
+    def rule(legs, stocks_df):
+        return pair_strategy(pair_legs(legs, first_type, second_type, same_strike, strike_order=strike_order), strategy)
+    return rule
+
+# (name, first type, second type) of the vertical spreads, lower strike first
+VERTICALS = [
+    ('BULL_CALL', 'LC', 'SC'),
+    ('BEAR_CALL', 'SC', 'LC'),
+    ('BULL_PUT', 'LP', 'SP'),
+    ('BEAR_PUT', 'SP', 'LP'),
+]
+
+def vertical_pairs(legs):
+    """Return the four kinds of vertical spreads as (name, pairs), lower strike first."""
+    return [(name, pair_legs(legs, first, second, same_strike=False, strike_order='<'))
+            for name, first, second in VERTICALS]
+
+def iron_condors(legs, stocks_df):
+    """Join bull put and bear call verticals of the same expiration into iron condors."""
+    spreads = dict(vertical_pairs(legs))
+    puts = spreads['BULL_PUT'][KEYS + ['strike_1', 'strike_2', 'leg_id_1', 'leg_id_2', 'quantity_1', 'quantity_2']]
+    calls = spreads['BEAR_CALL'][KEYS + ['strike_1', 'strike_2', 'leg_id_1', 'leg_id_2', 'quantity_1', 'quantity_2']]
+    condors = puts.merge(calls, on=KEYS, suffixes=('_put', '_call'))
+    condors = condors[condors['strike_2_put'] < condors['strike_1_call']]
+    # each vertical joins at most one condor, innermost wings first
+    condors = condors.assign(width=condors['strike_1_call'] - condors['strike_2_put'])
+    condors = condors.sort_values(['width', 'leg_id_1_put', 'leg_id_1_call'], kind='stable')
+    condors = condors.drop_duplicates(['leg_id_1_put', 'leg_id_2_put']).drop_duplicates(['leg_id_1_call', 'leg_id_2_call'])
+    condors = condors.sort_values(KEYS + ['strike_1_put'], kind='stable')
+    leg_cols = ['1_put', '2_put', '1_call', '2_call']
+    quantity = np.minimum.reduce([condors[f'quantity_{c}'].abs().values for c in leg_cols]) if len(condors) else []
+    return pd.DataFrame({
+        'strategy': 'IRON_CONDOR',
+        'ticker': condors['ticker'].values,
+        'expiration': condors['expiration'].values,
+        'strikes': list(zip(*[condors[f'strike_{c}'] for c in leg_cols])),
+        'quantity': quantity,
+        'leg_ids': list(zip(*[condors[f'leg_id_{c}'] for c in leg_cols])),
+        'stock_ids': [()] * len(condors),
+        'legs': ('LP ' + condors['strike_1_put'].astype(str) + ' / SP ' + condors['strike_2_put'].astype(str)
+                 + ' / SC ' + condors['strike_1_call'].astype(str) + ' / LC ' + condors['strike_2_call'].astype(str)).values,
+    })
+
+def covered_calls(legs, stocks_df):
+    """Cover short calls with 100 shares per contract of the same ticker, nearest expiration first."""
+    if stocks_df is None or stocks_df.empty:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+    stocks = stocks_df.reset_index(drop=True)
+    stocks = stocks.assign(stock_id=np.arange(len(stocks)), ticker=stocks['ticker'].astype(str))
+    stocks = stocks[stocks['quantity'] > 0]
+    shares = stocks.groupby('ticker')['quantity'].sum()
+    stock_ids = stocks.groupby('ticker')['stock_id'].agg(tuple)
+
+    calls = legs[legs['options_type'] == 'SC']
+    calls = calls.assign(ticker=calls['ticker'].astype(str), contracts=calls['quantity'].abs())
+    calls = calls[calls['ticker'].isin(shares.index)].sort_values(KEYS + ['strike'], kind='stable')
+    available = (shares.reindex(calls['ticker']).values // 100)
+    used_before = calls.groupby('ticker')['contracts'].cumsum().values - calls['contracts'].values
+    covered = np.clip(available - used_before, 0, calls['contracts'].values)
+    calls = calls.assign(covered=covered)
+    calls = calls[calls['covered'] > 0]
+    return pd.DataFrame({
+        'strategy': 'COVERED_CALL',
+        'ticker': calls['ticker'].values,
+        'expiration': calls['expiration'].values,
+        'strikes': [(strike,) for strike in calls['strike']],
+        'quantity': calls['covered'].values,
+        'leg_ids': [(leg_id,) for leg_id in calls['leg_id']],
+        'stock_ids': stock_ids.reindex(calls['ticker']).values,
+        'legs': ('SC ' + calls['strike'].astype(str) + ' / ' + (calls['covered'] * 100).astype(str) + ' shares').values,
+    })
+
+# each rule takes (legs, stocks_df) and returns rows of the strategy table; rules earlier in the list
+# take their contracts first, so synthetic longs match process_synthetics and condors keep their wings
+STRATEGY_RULES = [
+    synthetic_longs,
+    paired('SYN_SHORT', 'SC', 'LP', same_strike=True),
+    iron_condors,
+    paired('LONG_STRADDLE', 'LC', 'LP', same_strike=True),
+    paired('SHORT_STRADDLE', 'SC', 'SP', same_strike=True),
+    paired('LONG_STRANGLE', 'LP', 'LC', same_strike=False, strike_order='<'),
+    paired('SHORT_STRANGLE', 'SP', 'SC', same_strike=False, strike_order='<'),
+    *[paired(name, first, second, same_strike=False, strike_order='<') for name, first, second in VERTICALS],
+    covered_calls,
+]
+
+def take_contracts(legs, table):
+    """Legs left once the strategies in table use their contracts; legs with none left are dropped"""
+    leg_ids = [leg_id for ids in table['leg_ids'] for leg_id in ids]
+    quantity = [q for ids, q in zip(table['leg_ids'], table['quantity']) for _ in ids]
+    used = pd.Series(quantity, index=leg_ids, dtype=float).groupby(level=0).sum()
+    remaining = legs['quantity'].abs().to_numpy(dtype=float) - used.reindex(legs['leg_id']).fillna(0).to_numpy()
+    legs = legs.assign(quantity=np.sign(legs['quantity'].to_numpy(dtype=float)) * remaining)
+    return legs[remaining > 0]
+
+def detect_strategies(options_df, stocks_df=None, rules=STRATEGY_RULES):
+    """Detect multi-leg strategies in harmonized option legs.
+
+    Returns a table with one row per strategy, linking the positional leg_ids of
+    options_df and, for covered calls, the positional stock_ids of stocks_df. The
+    same rows are linked by leg_keys (OPTION_KEYS tuples) and stock_keys
+    (STOCK_KEYS tuples), which still resolve once the frames are stored or
+    reordered. Rules run in order and each contract goes to the first strategy
+    that uses it, so no contract is counted twice; a leg can still be split
+    across strategies by quantity. Legs are matched across accounts, like the
+    synthetic long handling in process_synthetics.
+    """
+    legs = option_legs(options_df)
+    tables = []
+    for rule in rules:
+        table = rule(legs, stocks_df)
+        if not table.empty:
+            tables.append(table)
+            legs = take_contracts(legs, table)
+    if not tables:
+        return pd.DataFrame(columns=STRATEGY_COLUMNS)
+    table = pd.concat(tables, ignore_index=True)
+    leg_keys = row_keys(options_df, OPTION_KEYS)
+    stock_keys = row_keys(stocks_df, STOCK_KEYS) if stocks_df is not None else []
+    table['leg_keys'] = [tuple(leg_keys[i] for i in ids) for ids in table['leg_ids']]
+    table['stock_keys'] = [tuple(stock_keys[i] for i in ids) for ids in table['stock_ids']]
+    return table[STRATEGY_COLUMNS]
+
+def process_synthetics(df):
+    """Identify synthetic longs and adjust the dataframe.
+
+    Each matched LC/SP pair moves min(LC qty, -SP qty) contracts into a SYN_LONG row
+    appended at the end; the remaining LC and SP quantities keep their per-contract
+    cost basis and are revalued from their last price.
+    """
+    df = df.copy()
+    pairs = synthetic_long_pairs(option_legs(df))
+    if pairs.empty:
+        return df[df['quantity'] != 0]
+
+    lc_qty = pairs['quantity_1'].values
+    sp_qty = pairs['quantity_2'].values
+    synth_qty = np.minimum(lc_qty, -sp_qty)
+
+    # Unit values (positive for both)
+    unit_lc_current = pairs['current value_1'].values / lc_qty
+    unit_sp_current = pairs['current value_2'].values / sp_qty
+    unit_lc_cost = pairs['cost basis_1'].values / lc_qty
+    unit_sp_cost = pairs['cost basis_2'].values / sp_qty
+
+    # Synthetic rows start from the LC leg
+    lc_idx = df.index[pairs['leg_id_1'].values]
+    sp_idx = df.index[pairs['leg_id_2'].values]
+    synth_df = df.loc[lc_idx].copy()
+    synth_df['options_type'] = 'SYN_LONG'
+    synth_df['quantity'] = synth_qty
+    synth_df['current value'] = synth_qty * (unit_lc_current + (unit_sp_current * -1))
+    synth_df['cost basis'] = synth_qty * (unit_lc_cost + (unit_sp_cost * -1))
+    synth_df['gain loss'] = synth_df['current value'] - synth_df['cost basis']
+    synth_df['last price'] = np.nan  # Not applicable
+
+    # Adjust LC and SP rows
+    df.loc[lc_idx, 'quantity'] = lc_qty - synth_qty
+    df.loc[lc_idx, 'cost basis'] = df.loc[lc_idx, 'cost basis'].values - synth_qty * unit_lc_cost
+    df.loc[sp_idx, 'quantity'] = sp_qty + synth_qty
+    df.loc[sp_idx, 'cost basis'] = df.loc[sp_idx, 'cost basis'].values - synth_qty * (unit_sp_cost * -1)
+    adjusted = lc_idx.append(sp_idx)
+    df.loc[adjusted, 'current value'] = df.loc[adjusted, 'last price'] * 100 * df.loc[adjusted, 'quantity']
+    df.loc[adjusted, 'gain loss'] = df.loc[adjusted, 'current value'] - df.loc[adjusted, 'cost basis']
+
+    # Remove zero-quantity rows and append synthetic rows
+    df = df[df['quantity'] != 0]
+    return pd.concat([df, synth_df], ignore_index=True)
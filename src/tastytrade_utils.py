@@ -1,68 +1,64 @@
+import logging
 import argparse
 import re
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from parse_utils import parse_month
+from parse_utils import register_parser, parse_month, open_source
 
-def get_type(row):
-    """Get type of position"""
-    type = row.get('Type', '')
-    if pd.isna(type):
-        return 'UNKNOWN'
-    if isinstance(type, float):
-        return 'UNKNOWN'
-    if re.search(r'\b(OPTION)\b', type.upper()):
-        return 'OPTION'
-    elif re.search(r'\b(STOCK)\b', type.upper()):
-        return 'STOCK'
-    elif re.search(r'\b(CRYPTO)\b', type.upper()):
-        return 'CRYPTO'
-    else:
-        return 'UNKNOWN'
-    
-def is_option_row(row):
-    """Determine if a row represents an options position."""
-    return bool(re.search(r'\b(OPTION)\b', get_type(row)))
+logger = logging.getLogger(__name__)
 
-def is_stock_row(row):
-    """Determine if a row represents an options position."""
-    return bool(re.search(r'\b(STOCK)\b', get_type(row)))
+ASSET_CLASSES = ['OPTION', 'STOCK', 'CRYPTO', 'UNKNOWN']
 
-def is_crypto_row(row):
-    """Determine if a row represents a crypto position."""
-    return bool(re.search(r'\b(CRYPTO)\b', get_type(row)))
+def classify_rows(df):
+    """Classify every row as OPTION, STOCK, CRYPTO or UNKNOWN in a single vectorized pass."""
+    if 'Type' not in df.columns:
+        return pd.Series(pd.Categorical(['UNKNOWN'] * len(df), categories=ASSET_CLASSES), index=df.index)
+    types = df['Type'].fillna('').astype(str).str.upper()
+    conditions = [types.str.contains(r'\b' + asset_class + r'\b', regex=True) for asset_class in ASSET_CLASSES[:-1]]
+    asset_class = np.select(conditions, ASSET_CLASSES[:-1], default='UNKNOWN')
+    return pd.Series(pd.Categorical(asset_class, categories=ASSET_CLASSES), index=df.index)
 
+@register_parser
 class TastytradeParser(object):
     """Class to parse tastytrade csv files"""
-    def __init__(self, csv_file_path):
-        self.csv_file_path = csv_file_path
+    # bump when parsing output changes so cached parses are invalidated
+    PARSER_VERSION = 1
+    BROKER = 'tastytrade'
+    CONFIG_SECTION = 'tastytrade'
+
+    def __init__(self, source):
+        """source: path, bytes or file object holding the positions export"""
+        self.source = source
 
     def load(self):
         """Load CSV and separate options and stocks"""
-        self.df = pd.read_csv(self.csv_file_path)
+        with open_source(self.source) as f:
+            self.df = pd.read_csv(f)
         # Add cost basis cleaning (assuming column 'Cost Basis'; adjust if different)
         if 'Cost Basis' in self.df.columns:
             self.df['Cost Basis'] = self.df['Cost Basis'].str.replace(r'[\$,]', '', regex=True).astype(float)
         else:
             self.df['Cost Basis'] = 0.0  # Fallback
+        self.df['asset_class'] = classify_rows(self.df)
         self.options_df = self.get_options_rows(self.df)
         self.stock_df = self.get_stock_rows(self.df)
-        print("combining stock and cryto postions for tastytrade")
+        logger.info("combining stock and cryto postions for tastytrade")
         crypto_df = self.get_crypto_rows(self.df)
         self.stock_df = pd.concat([self.stock_df, crypto_df], ignore_index=True)
-        print(f"tot|options|stock|diff {len(self.df)}|{len(self.options_df)}|{len(self.stock_df)}|{len(self.df) - (len(self.options_df) + len(self.stock_df))}")
+        logger.info(f"tot|options|stock|diff {len(self.df)}|{len(self.options_df)}|{len(self.stock_df)}|{len(self.df) - (len(self.options_df) + len(self.stock_df))}")
 
     def get_options_rows(self, df):
         """Get only options rows"""
-        return df[df.apply(is_option_row, axis=1)]
+        return df[df['asset_class'] == 'OPTION']
 
     def get_stock_rows(self, df):
         """Get only stock rows"""
-        return df[df.apply(is_stock_row, axis=1)]
+        return df[df['asset_class'] == 'STOCK']
     
     def get_crypto_rows(self, df):
-        """Get only stock rows"""
-        return df[df.apply(is_crypto_row, axis=1)]
+        """Get only crypto rows"""
+        return df[df['asset_class'] == 'CRYPTO']
 
     def format_options_data(self):
         """Format options data for output"""
@@ -1,14 +1,115 @@
 # Updated file: web_interface.py
-from flask import Flask, request
-from werkzeug.utils import secure_filename
-import tempfile
+from flask import Flask, request, jsonify, send_file, url_for, abort, Response
 import os
-from UpdatePositionCSVs import harmonize_and_store, annotaions_from_df  # Assuming you want annotations too
-from PlotPositions import PlotPositions
+from UpdatePositionCSVs import harmonize_and_store, store_harmonized, annotaions_from_df  # Assuming you want annotations too
+from PlotPositions import PlotPositions, PLOT_VERSION
+from parse_cache import ParseCache
+from result_cache import ResultCache, result_key
+from figure_cache import FigureCache
+from instrumentation import Instrumentation
+from jobs import JobQueue, output_lock
+from snapshot_store import SnapshotStore, LEGS
+from position_index import PositionIndex
+import hashlib
+import html
+import logging
+import shutil
+import threading
+from datetime import date
 from pathlib import Path
+import pandas as pd
 
 app = Flask(__name__)
 
+# number of update jobs run at once, each in its own worker process
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+# snapshot store served by the /api/positions endpoints
+app.config['SNAPSHOT_DIR'] = os.path.expanduser(os.environ.get('SNAPSHOT_DIR', '~/Desktop/snapshots'))
+app.config['API_PAGE_LIMIT'] = 1000
+JOBS = None
+INDEX = None
+INDEX_LOCK = threading.Lock()
+
+def job_queue():
+    global JOBS
+    if JOBS is None:
+        JOBS = JobQueue(workers=app.config['JOB_WORKERS'])
+    return JOBS
+
+# files an update writes to the output directory that are kept in the result cache
+RESULT_FILES = ('plots.html', 'expiring_options.csv', 'strategies.csv')
+EXPIRING_HTML = 'expiring.html'
+
+def page_header(output_dir):
+    return f'''
+    <!doctype html>
+    <title>Update Completed</title>
+    <h1>Update Completed!</h1>
+    <p>Plots are saved to {html.escape(str(Path(output_dir) / 'plots.html'))}.</p>
+    '''
+
+def page_footer(timings):
+    return f'''
+    <h3>Stage timings</h3>
+    <pre>{html.escape(timings)}</pre>
+    <br><a href="/">Back to form</a>
+    '''
+
+def run_update(progress, fidelity_csv, tastytrade_csv, output_dir, cache_key):
+    """Job body: write_update under the output directory's lock, yielding the result page.
+
+    Jobs aimed at the same output_dir share its report partial, sections, images
+    and snapshots, so they run one after another. A job that waited for the lock
+    restores from the result cache if an identical update finished meanwhile.
+    """
+    progress.update(stage='waiting for output directory')
+    with output_lock(output_dir):
+        cached = ResultCache().read(cache_key)
+        if cached is not None:
+            yield restore_update(*cached, output_dir)
+        else:
+            yield from write_update(progress, fidelity_csv, tastytrade_csv, output_dir, cache_key)
+
+def write_update(progress, fidelity_csv, tastytrade_csv, output_dir, cache_key):
+    """Harmonize, annotate, plot and report, yielding the result page as it is written.
+
+    The exports come in as bytes and are parsed from memory. The frames and
+    report files are stored in the result cache under cache_key at the end.
+    """
+    instrumentation = Instrumentation(listener=progress.listener)
+    # the job already has a process of its own, so parse the two files in it too
+    stocks_df, options_df, _ = harmonize_and_store([('fidelity', fidelity_csv), ('tastytrade', tastytrade_csv)], output_format='parquet', output_path=output_dir, cache=ParseCache(),
+                                                   workers=1, instrumentation=instrumentation)
+    
+    # Optionally run annotations
+    with instrumentation.stage('annotate', rows_in=len(options_df)):
+        annotaions_from_df(options_df)
+    
+    plotter = PlotPositions(input_dir=output_dir, output_dir=output_dir, figure_cache=FigureCache())
+    yield page_header(output_dir)
+    with instrumentation.stage('plot', rows_in=len(stocks_df) + len(options_df)):
+        for sections, section in enumerate(plotter.iter_report(stocks_df, options_df), start=1):
+            progress.detail(sections=sections)
+            yield section
+    with instrumentation.stage('report', rows_in=len(options_df)):
+        expiring_html = plotter.report_expiring_options(options_df)
+        yield expiring_html
+    files = [Path(output_dir) / name for name in RESULT_FILES if (Path(output_dir) / name).exists()]
+    # the raw legs are only kept in the snapshot just written; a restored snapshot needs them for --incremental
+    legs_df, = SnapshotStore(Path(output_dir) / 'snapshots').latest((LEGS,))
+    ResultCache().write(cache_key, stocks_df, options_df, legs_df, files, {EXPIRING_HTML: expiring_html})
+    yield page_footer(instrumentation.summary())
+
+def restore_update(stocks_df, options_df, legs_df, entry, output_dir):
+    """Write a cached update's snapshot and report files to output_dir and return its result page"""
+    for name in RESULT_FILES:
+        if (entry / name).exists():
+            shutil.copyfile(entry / name, Path(output_dir) / name)
+    store_harmonized(stocks_df, options_df, 'parquet', output_dir, legs_df=legs_df)
+    plots_html = (entry / 'plots.html').read_text().removeprefix('<html><body>').removesuffix('</body></html>')
+    return (page_header(output_dir) + plots_html + (entry / EXPIRING_HTML).read_text()
+            + page_footer(f'Served from the result cache ({entry.name[:12]})'))
+
 @app.route('/', methods=['GET', 'POST'])
 def home():
     if request.method == 'POST':
@@ -16,46 +117,40 @@ def home():
         tastytrade_file = request.files['tastytrade']
         output_dir = os.path.expanduser(request.form.get('output', '~/Desktop'))
         
-        # Ensure output_dir exists
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Save uploaded files to temporary paths
-        fidelity_path = None
-        tastytrade_path = None
-        if fidelity_file and fidelity_file.filename:
-            fidelity_path = os.path.join(tempfile.gettempdir(), secure_filename(fidelity_file.filename))
-            fidelity_file.save(fidelity_path)
-        
-        if tastytrade_file and tastytrade_file.filename:
-            tastytrade_path = os.path.join(tempfile.gettempdir(), secure_filename(tastytrade_file.filename))
-            tastytrade_file.save(tastytrade_path)
-        
-        if not fidelity_path or not tastytrade_path:
+        if not (fidelity_file and fidelity_file.filename) or not (tastytrade_file and tastytrade_file.filename):
             return 'Please upload both CSV files.'
         
-        # Run the harmonization and storage
-        stocks_df, options_df = harmonize_and_store(fidelity_path, tastytrade_path, output_format='json', output_path=output_dir)
-        
-        # Optionally run annotations
-        annotaions_from_df(options_df)
+        # Ensure output_dir exists
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        # Run plotting and reporting
-        plotter = PlotPositions(input_dir=output_dir, output_dir=output_dir)
-        plotter.plot_all(stocks_df, options_df)
-        expiring_html = plotter.report_expiring_options(options_df)
+        # Hand the uploads to the job as bytes; nothing is written under a shared name.
+        # Werkzeug spools large uploads to anonymous temporary files, unique per request.
+        fidelity_csv, tastytrade_csv = fidelity_file.read(), tastytrade_file.read()
+        jobs = job_queue()
+        job_id = jobs.create()
+        headers = {'Location': url_for('job_status', job_id=job_id)}
         
-        # Optional: Clean up temp files
-        os.remove(fidelity_path)
-        os.remove(tastytrade_path)
+        # the same pair of files with the same config gives the same result, so serve it from the cache
+        cache_key = result_key([fidelity_csv, tastytrade_csv], PLOT_VERSION, date.today().isoformat())
+        cached = ResultCache().read(cache_key)
+        page = None
+        if cached is not None:
+            try:
+                with output_lock(output_dir, blocking=False):
+                    page = restore_update(*cached, output_dir)
+            except BlockingIOError:
+                # another job is writing output_dir; the queued job restores from the cache once it is done
+                pass
+        if page is not None:
+            jobs.complete(job_id, page)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(id=job_id, status=headers['Location'], result=url_for('job_result', job_id=job_id), cached=True), 200, headers
+            return page, 200, headers
         
-        return f'''
-        <!doctype html>
-        <title>Update Completed</title>
-        <h1>Update Completed!</h1>
-        <p>Check your browser for the opened plots.html or console for reports.</p>
-        {expiring_html}
-        <br><a href="/">Back to form</a>
-        '''
+        jobs.submit(job_id, run_update, fidelity_csv, tastytrade_csv, output_dir, cache_key)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(id=job_id, status=headers['Location'], result=url_for('job_result', job_id=job_id)), 202, headers
+        return JOB_PAGE.replace('JOB_ID', job_id), 202, headers
     
     return '''
     <!doctype html>
@@ -69,5 +164,134 @@ def home():
     </form>
     '''
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Job status with the stages finished so far and the one running"""
+    state = job_queue().status(job_id)
+    if state is None:
+        abort(404)
+    return jsonify(state)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """The finished update page; 202 with the status while the job is still running"""
+    jobs = job_queue()
+    state = jobs.status(job_id)
+    if state is None:
+        abort(404)
+    if state['status'] == 'failed':
+        return jsonify(state), 500
+    path = jobs.result_path(job_id)
+    if path is None:
+        return jsonify(state), 202
+    return send_file(path, mimetype='text/html')
+
+def position_index():
+    """Index of the latest snapshot, rebuilt only when a newer snapshot is stored"""
+    global INDEX
+    store = SnapshotStore(app.config['SNAPSHOT_DIR'])
+    snapshot_id = store.latest_id()
+    with INDEX_LOCK:
+        if snapshot_id is not None and (INDEX is None or INDEX.snapshot_id != snapshot_id):
+            INDEX = PositionIndex.from_store(store)
+        return INDEX if snapshot_id is not None else None
+
+def list_arg(name):
+    """Values of a query parameter given repeatedly and/or comma separated"""
+    return [value for arg in request.args.getlist(name) for value in arg.split(',') if value]
+
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        abort(400, f"{name} must be a date, e.g. 2025-01-17")
+
+def int_arg(name, default, low, high=None):
+    """Integer query parameter from low to high (no upper bound when high is None); 400 for anything else"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = None
+    if value is None or value < low or (high is not None and value > high):
+        abort(400, f"{name} must be an integer " + (f"from {low} to {high}" if high is not None else f"of at least {low}"))
+    return value
+
+@app.route('/api/positions/<kind>')
+def positions(kind):
+    """Positions of the latest snapshot as JSON.
+
+    kind is stocks or options. Query parameters: ticker, broker, account and type
+    (each repeatable or comma separated), expires_after/expires_before (options,
+    inclusive dates), fields (comma separated columns), limit and offset. The
+    response carries an ETag of the snapshot and query, so a request with a
+    matching If-None-Match gets 304 without the payload being built.
+    """
+    if kind not in ('stocks', 'options'):
+        abort(404)
+    index = position_index()
+    if index is None:
+        abort(404, f"No snapshots in {app.config['SNAPSHOT_DIR']}")
+    frame = index.frames[kind]
+
+    query = sorted((name, tuple(request.args.getlist(name))) for name in request.args)
+    etag = hashlib.sha256(repr((index.snapshot_id, kind, query)).encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    type_column = 'options_type' if kind == 'options' else 'type'
+    filters = {column: list_arg(name) for name, column in
+               (('ticker', 'ticker'), ('broker', 'broker'), ('account', 'account'), ('type', type_column))
+               if list_arg(name)}
+    start, end = date_arg('expires_after'), date_arg('expires_before')
+    if kind == 'stocks' and (start is not None or end is not None):
+        abort(400, "expiration filters only apply to options")
+    fields = list_arg('fields') or None
+    unknown = [field for field in fields or () if field not in frame.fields]
+    if unknown:
+        abort(400, f"Unknown fields {unknown}; available: {frame.fields}")
+    limit = int_arg('limit', 100, 1, app.config['API_PAGE_LIMIT'])
+    # an offset past the end (e.g. the filtered rows shrank between pages) gives an empty page
+    offset = int_arg('offset', 0, 0)
+
+    rows = frame.query(filters, start, end)
+    response = jsonify(snapshot=index.snapshot_id, kind=kind, total=len(rows), offset=offset, limit=limit,
+                       rows=frame.records(rows[offset:offset + limit], fields))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# shown after a POST; polls the status endpoint and opens the result when the job is done
+JOB_PAGE = '''
+<!doctype html>
+<title>Update Queued</title>
+<h1>Update job JOB_ID</h1>
+<p id="status">Queued</p>
+<pre id="stages"></pre>
+<script>
+(function poll() {
+  fetch('/jobs/JOB_ID').then(function (r) { return r.json(); }).then(function (job) {
+    var running = job.stage ? ', running ' + job.stage : '';
+    var sections = job.detail && job.detail.sections ? ' (' + job.detail.sections + ' sections)' : '';
+    document.getElementById('status').textContent = job.status + running + sections + (job.error ? ': ' + job.error : '');
+    document.getElementById('stages').textContent = job.stages.map(function (s) {
+      return s.stage + ' ' + s.seconds.toFixed(2) + 's';
+    }).join('\\n');
+    if (job.status === 'done') window.location = '/jobs/JOB_ID/result';
+    else if (job.status !== 'failed') setTimeout(poll, 1000);
+  });
+})();
+</script>
+<a href="/">Back to form</a>
+'''
+
 if __name__ == '__main__':
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(message)s')
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+import web_interface
+from snapshot_store import SnapshotStore
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    stocks_df = pd.DataFrame({'broker': 'fidelity', 'account': 'Z1', 'ticker': ['AAPL', 'MSFT'], 'quantity': [10.0, 5.0],
+                              'last price': [200.0, 400.0], 'type': 'Cash'})
+    options_df = pd.DataFrame({'broker': 'fidelity', 'account': 'Z1', 'ticker': ['AAPL', 'AAPL', 'MSFT'],
+                               'quantity': [1, -1, 2], 'options_type': ['LC', 'SC', 'LP'],
+                               'expiration': pd.to_datetime(['2027-01-15', '2027-01-15', '2027-06-18']),
+                               'strike': [200.0, 220.0, 380.0]})
+    SnapshotStore(tmp_path / 'snapshots').write(stocks_df, options_df)
+    monkeypatch.setitem(web_interface.app.config, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(web_interface, 'INDEX', None)
+    return web_interface.app.test_client()
+
+def test_filters_and_pages(client):
+    page = client.get('/api/positions/options?ticker=AAPL&limit=1&offset=1').get_json()
+    assert page['total'] == 2 and len(page['rows']) == 1 and page['rows'][0]['options_type'] == 'SC'
+
+def test_offset_past_end_is_empty_page(client):
+    page = client.get('/api/positions/options?ticker=MSFT&offset=5').get_json()
+    assert page['total'] == 1 and page['rows'] == []
+
+@pytest.mark.parametrize('query', ['limit=abc', 'offset=x', 'offset=1.5', 'offset=-1', 'limit=0', 'limit=1001'])
+def test_bad_paging_is_rejected(client, query):
+    assert client.get(f'/api/positions/stocks?{query}').status_code == 400
@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from greeks import add_greeks, bs_greeks, bs_price, implied_volatility, norm_cdf
+
+RATE = 0.04
+
+def test_norm_cdf_matches_erfc():
+    x = np.concatenate([np.linspace(-40, 40, 4001), [0.0]])
+    expected = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in x])
+    assert np.max(np.abs(norm_cdf(x) - expected)) < 1e-14
+    assert np.isnan(norm_cdf(np.nan))
+
+def test_put_call_parity():
+    spot, strike, years, vol = np.array([80.0, 100.0, 130.0]), 100.0, 0.5, 0.25
+    call = bs_price(spot, strike, years, vol, RATE, is_call=True)
+    put = bs_price(spot, strike, years, vol, RATE, is_call=False)
+    np.testing.assert_allclose(call - put, spot - strike * np.exp(-RATE * years), atol=1e-10)
+
+def test_expired_and_forward_legs():
+    spot = np.array([90.0, 110.0])
+    np.testing.assert_allclose(bs_price(spot, 100.0, 0.0, 0.3, RATE, is_call=True), [0.0, 10.0])
+    np.testing.assert_allclose(bs_price(spot, 100.0, 0.0, 0.3, RATE, is_call=False), [10.0, 0.0])
+    np.testing.assert_allclose(bs_price(spot, 100.0, 1.0, 0.3, RATE, is_forward=True), spot - 100.0 * np.exp(-RATE))
+
+def test_implied_volatility_round_trip():
+    vol = np.array([0.05, 0.2, 0.6, 1.5])
+    strike, years = np.array([95.0, 100.0, 110.0, 150.0]), np.array([0.25, 0.5, 1.0, 2.0])
+    is_call = np.array([True, False, True, False])
+    price = bs_price(100.0, strike, years, vol, RATE, is_call)
+    np.testing.assert_allclose(implied_volatility(price, 100.0, strike, years, RATE, is_call), vol, atol=1e-5)
+    # deep in the money the price barely depends on vol, so only the price is pinned
+    deep = bs_price(100.0, 90.0, 0.1, 0.05, RATE, True)
+    deep_vol = implied_volatility(deep, 100.0, 90.0, 0.1, RATE, True)
+    assert bs_price(100.0, 90.0, 0.1, deep_vol, RATE, True) == pytest.approx(deep, abs=1e-6)
+    # below intrinsic value there is no volatility, and expired legs have none either
+    assert np.isnan(implied_volatility([5.0, 1.0], 100.0, [90.0, 100.0], [0.5, 0.0], RATE, True)).all()
+
+@pytest.mark.parametrize('is_call', [True, False])
+def test_greeks_match_finite_differences(is_call):
+    spot, strike, years, vol, h = 105.0, 100.0, 0.75, 0.3, 1e-3
+    price = lambda s=spot, t=years, v=vol: bs_price(s, strike, t, v, RATE, is_call)
+    greeks = bs_greeks(spot, strike, years, vol, RATE, is_call)
+    assert greeks['delta'] == pytest.approx((price(s=spot + h) - price(s=spot - h)) / (2 * h), rel=1e-6)
+    assert greeks['gamma'] == pytest.approx((price(s=spot + h) - 2 * price() + price(s=spot - h)) / h ** 2, rel=1e-4)
+    assert greeks['vega'] == pytest.approx((price(v=vol + h) - price(v=vol - h)) / (2 * h), rel=1e-6)
+    # theta is per year of calendar time, i.e. minus the derivative in time left
+    assert greeks['theta'] == pytest.approx(-(price(t=years + h) - price(t=years - h)) / (2 * h), rel=1e-6)
+
+def test_add_greeks_recovers_leg_volatility():
+    options_df = pd.DataFrame({'ticker': ['XYZ', 'XYZ'], 'options_type': ['LC', 'SP'], 'strike': [100.0, 95.0],
+                               'expiration': ['2027-04-16', '2027-04-16'], 'quantity': [2, -1]})
+    years = (pd.Timestamp('2027-04-16') - pd.Timestamp('2026-10-16')).days / 365.0
+    last_price = bs_price(100.0, options_df['strike'].to_numpy(), years, 0.35, RATE, np.array([True, False]))
+    greeks_df = add_greeks(options_df.assign(**{'last price': last_price}), prices={'XYZ': 100.0},
+                           current_date='2026-10-16', rate=RATE)
+    np.testing.assert_allclose(greeks_df['iv'], 0.35, atol=1e-5)
+    np.testing.assert_allclose(greeks_df['delta dollars'], greeks_df['delta'] * [200, -100] * 100.0)
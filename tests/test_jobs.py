@@ -0,0 +1,84 @@
+import functools
+import io
+import time
+
+import pytest
+
+import web_interface
+from jobs import JobQueue
+from snapshot_store import LEGS, SnapshotStore
+
+FIDELITY_CSV = '''Account Number,Account Name,Symbol,Description,Quantity,Last Price,Last Price Change,Current Value,Today's Gain/Loss Dollar,Cost Basis Total,Type
+Z1,Individual,AAPL,AAPL INC,{shares},$684.58,+$1.00,$1,"$1.00","$3,843.09",Cash
+Z1,Individual,MSFT,MSFT INC,67,$869.26,+$1.00,$1,"$1.00","$4,424.76",Cash
+Z1,Individual,SPY,SPY INC,1,$71.34,+$1.00,$1,"$1.00","$61.00",Cash
+Z1,Individual, -AAPL281020P600,AAPL OCT 20 2028 $600 PUT,3,$26.13,+$0.1,$1,$1,"$581.29",Margin
+Z1,Individual, -MSFT271217C900,MSFT DEC 17 2027 $900 CALL,-1,$56.96,+$0.1,$1,$1,"$2,770.02",Margin
+'''
+
+TASTYTRADE_CSV = '''Account,Symbol,Type,Quantity,Exp Date,DTE,Strike Price,Call/Put,Underlying Last Price,Bid (Sell),Cost Basis
+5WX1,AAPL,STOCK,75,,,,,684.58,,"$3,937.87"
+5WX1,AAPL  271119P00650000,OPTION,2,"Nov 19, 2027",100d,650,PUT,684.58,40.10,"$218.45"
+'''
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # keep the caches out of ~/.cache; the job workers are forked, so they see these too
+    for name in ('ParseCache', 'ResultCache', 'FigureCache'):
+        cache = getattr(web_interface, name)
+        monkeypatch.setattr(web_interface, name, functools.partial(cache, tmp_path / 'cache' / name))
+    monkeypatch.setattr(web_interface, 'JOBS', None)
+    yield web_interface.app.test_client()
+    web_interface.job_queue().shutdown()
+
+def upload(client, shares, output_dir):
+    data = {'fidelity': (io.BytesIO(FIDELITY_CSV.format(shares=shares).encode()), 'fidelity.csv'),
+            'tastytrade': (io.BytesIO(TASTYTRADE_CSV.encode()), 'tastytrade.csv'),
+            'output': str(output_dir)}
+    return client.post('/', data=data, content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+def post_update(client, shares, output_dir):
+    response = upload(client, shares, output_dir)
+    assert response.status_code == 202
+    return response.get_json()['id']
+
+def wait_for(client, job_ids, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        states = [client.get(f'/jobs/{job_id}').get_json() for job_id in job_ids]
+        if all(state['status'] in ('done', 'failed') for state in states):
+            return states
+        time.sleep(0.5)
+    pytest.fail(f'jobs still running after {timeout}s')
+
+def test_concurrent_jobs_share_output_dir(client, tmp_path):
+    output_dir = tmp_path / 'shared'
+    # different uploads, so neither job is served from the other's cached result
+    job_ids = [post_update(client, shares, output_dir) for shares in (99, 150)]
+    states = wait_for(client, job_ids)
+
+    assert [state['status'] for state in states] == ['done', 'done'], [state['error'] for state in states]
+    for job_id in job_ids:
+        page = client.get(f'/jobs/{job_id}/result').get_data(as_text=True)
+        assert 'Update Completed!' in page and '<h3>Stage timings</h3>' in page
+    assert (output_dir / 'plots.html').exists()
+    assert not (output_dir / 'plots.html.partial').exists()
+
+def test_cached_update_restores_legs(client, tmp_path):
+    wait_for(client, [post_update(client, 99, tmp_path / 'first')])
+    response = upload(client, 99, tmp_path / 'second')
+    assert response.status_code == 200 and response.get_json()['cached']
+
+    # an --incremental run against the restored snapshot diffs against its legs
+    legs_df, = SnapshotStore(tmp_path / 'second' / 'snapshots').latest((LEGS,))
+    assert legs_df is not None and len(legs_df) == 3
+
+def test_status_of_job_from_another_process(client, tmp_path, monkeypatch):
+    # a job finished by another web worker, or before a restart, is only on disk
+    job_id = JobQueue(jobs_dir=tmp_path / 'jobs').create()
+    JobQueue(jobs_dir=tmp_path / 'jobs').complete(job_id, '<p>done elsewhere</p>')
+    monkeypatch.setattr(web_interface, 'JOBS', JobQueue(jobs_dir=tmp_path / 'jobs'))
+
+    assert client.get(f'/jobs/{job_id}').get_json()['status'] == 'done'
+    assert client.get(f'/jobs/{job_id}/result').get_data(as_text=True) == '<p>done elsewhere</p>'
+    assert client.get('/jobs/0123456789abcdef0123456789abcdef').status_code == 404
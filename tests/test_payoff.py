@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from greeks import bs_price
+from payoff import date_grid, payoff_summary, payoff_surfaces, position_values
+
+TODAY = pd.Timestamp('2026-10-16')
+EXPIRATION = '2027-01-15'
+
+def bull_call_spread():
+    """Long the 100 call at 5.00, short the 105 call at 2.00: a 3.00 debit"""
+    return pd.DataFrame({'ticker': ['XYZ', 'XYZ'], 'options_type': ['LC', 'SC'], 'strike': [100.0, 105.0],
+                         'expiration': [EXPIRATION, EXPIRATION], 'quantity': [1, -1], 'last price': [5.0, 2.0]})
+
+def test_bull_call_spread_at_expiry():
+    surface, = payoff_surfaces(bull_call_spread(), prices={'XYZ': 100.0}, current_date=TODAY, num_prices=2001)
+    loss, _ = surface.max_loss()
+    profit, _ = surface.max_profit()
+    assert surface.dates[-1] == pd.Timestamp(EXPIRATION)
+    assert loss == pytest.approx(-300.0, abs=1e-6)
+    assert profit == pytest.approx(200.0, abs=1e-6)
+    np.testing.assert_allclose(surface.break_evens(), [103.0], atol=1e-6)
+    assert surface.unbounded() == (False, False)
+
+def test_today_is_zero_at_spot():
+    surface, = payoff_surfaces(bull_call_spread(), prices={'XYZ': 100.0}, current_date=TODAY, num_prices=101)
+    assert surface.dates[0] == TODAY
+    assert np.interp(100.0, surface.prices, surface.values[0]) == pytest.approx(0.0, abs=0.5)
+
+def test_stock_adds_linear_pnl():
+    options_df = bull_call_spread()
+    stocks_df = pd.DataFrame({'ticker': ['XYZ'], 'quantity': [50.0], 'last price': [100.0]})
+    with_stock, = payoff_surfaces(options_df, stocks_df, current_date=TODAY)
+    without, = payoff_surfaces(options_df, prices={'XYZ': 100.0}, current_date=TODAY)
+    np.testing.assert_allclose(with_stock.values - without.values, np.broadcast_to(50.0 * (without.prices - 100.0), without.values.shape))
+    assert payoff_summary([with_stock])['loss beyond grid'].tolist() == [True]
+
+def test_chunking_does_not_change_values():
+    rng = np.random.default_rng(0)
+    legs = 50
+    prices = np.linspace(50, 150, 41)
+    years = rng.uniform(0, 1, (legs, 3))
+    args = (prices, years, rng.uniform(80, 120, legs), rng.uniform(0.1, 0.6, legs), rng.choice([-2.0, 1.0], legs),
+            rng.random(legs) < 0.5, rng.random(legs) < 0.1)
+    np.testing.assert_allclose(position_values(*args, chunk_bytes=1), position_values(*args), rtol=1e-12)
+    expected = 100 * np.einsum('l,ldp->dp', args[4], bs_price(prices[None, None, :], args[2][:, None, None], years[:, :, None],
+                                                              args[3][:, None, None], 0.04, args[5][:, None, None],
+                                                              args[6][:, None, None]))
+    np.testing.assert_allclose(position_values(*args), expected, rtol=1e-12)
+
+def test_date_grid_is_capped():
+    expirations = pd.date_range('2026-11-01', periods=40, freq='W')
+    dates = date_grid(expirations, TODAY, num_dates=6, near_expirations=3)
+    assert len(dates) <= 9
+    assert dates[0] == TODAY and dates[-1] == expirations[-1]
+    assert set(expirations[:3]) <= set(dates)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from risk import Book, monte_carlo, shock_grid, ticker_shocks
+
+TODAY = pd.Timestamp('2026-10-16')
+
+def frames():
+    stocks_df = pd.DataFrame({'ticker': ['XYZ', 'XYZ', 'ABC'], 'quantity': [100.0, 50.0, 200.0],
+                              'last price': [100.0, 100.0, 40.0]})
+    options_df = pd.DataFrame({
+        'ticker': ['XYZ', 'XYZ', 'ABC', 'ABC'], 'options_type': ['LC', 'SC', 'LP', 'LP'],
+        'strike': [100.0, 110.0, 35.0, 35.0], 'expiration': ['2027-01-15'] * 4,
+        'quantity': [2, -2, 3, 1], 'last price': [6.0, 2.5, 1.2, 1.2]})
+    return stocks_df, options_df
+
+def test_shock_grid_consistent_with_ticker_shocks():
+    book = Book(*frames(), current_date=TODAY)
+    grid = shock_grid(book)
+    assert grid.loc[0.0, 0.0] == pytest.approx(0.0, abs=1e-8)
+    np.testing.assert_allclose(ticker_shocks(book).sum().to_numpy(), grid[0.0].to_numpy(), atol=1e-8)
+
+def test_stock_only_book_is_linear():
+    stocks_df, options_df = frames()
+    book = Book(stocks_df, options_df.iloc[:0], current_date=TODAY)
+    value = (stocks_df['quantity'] * stocks_df['last price']).sum()
+    assert shock_grid(book).loc[0.1, 0.0] == pytest.approx(0.1 * value)
+
+def test_netting_and_chunking_do_not_change_pnl():
+    stocks_df, options_df = frames()
+    book = Book(stocks_df, options_df, current_date=TODAY)
+    # the two ABC 35 puts and the two XYZ stock rows are netted
+    assert len(book) == 5
+    split = pd.concat([options_df, options_df.assign(quantity=0)], ignore_index=True)
+    spots = book.spots[None, :] * np.linspace(0.7, 1.3, 25)[:, None]
+    expected = book.pnl(spots, 0.05, days=10)
+    np.testing.assert_allclose(Book(stocks_df, split, current_date=TODAY).pnl(spots, 0.05, days=10), expected)
+    np.testing.assert_allclose(Book(stocks_df, options_df, current_date=TODAY, chunk_bytes=1).pnl(spots, 0.05, days=10),
+                               expected)
+
+def test_monte_carlo_independent_of_workers():
+    book = Book(*frames(), current_date=TODAY)
+    single = monte_carlo(book, num_paths=4000, batch_size=1000, workers=1)
+    pooled = monte_carlo(book, num_paths=4000, batch_size=1000, workers=2)
+    np.testing.assert_array_equal(single.pnl, pooled.pnl)
+    assert single.var == pooled.var
+    assert 0 < single.var <= single.expected_shortfall
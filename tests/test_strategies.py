@@ -0,0 +1,25 @@
+import pandas as pd
+
+from strategies import detect_strategies
+
+def legs(*rows):
+    """Option legs of one ticker and expiration from (options_type, strike, quantity) rows"""
+    types, strikes, quantities = zip(*rows)
+    return pd.DataFrame({'broker': 'fidelity', 'account': 'Z1', 'ticker': 'XYZ', 'expiration': '2027-01-15',
+                         'strike': strikes, 'options_type': types, 'quantity': quantities, 'last price': 1.0,
+                         'current value': 1.0, 'cost basis': 1.0, 'gain loss': 0.0})
+
+def test_contract_counted_once():
+    # the LC folds into a synthetic long, so there is no straddle left
+    table = detect_strategies(legs(('LC', 150.0, 3), ('LP', 150.0, 3), ('SP', 150.0, -3)))
+    assert table['strategy'].tolist() == ['SYN_LONG']
+    assert table['quantity'].tolist() == [3]
+
+def test_leftover_contracts_go_to_later_rules():
+    table = detect_strategies(legs(('LC', 150.0, 5), ('LP', 150.0, 2), ('SP', 150.0, -3)))
+    assert dict(zip(table['strategy'], table['quantity'])) == {'SYN_LONG': 3, 'LONG_STRADDLE': 2}
+
+def test_iron_condor_keeps_its_wings():
+    table = detect_strategies(legs(('LP', 90.0, 1), ('SP', 95.0, -1), ('SC', 105.0, -1), ('LC', 110.0, 1)))
+    assert table['strategy'].tolist() == ['IRON_CONDOR']
+    assert table['leg_keys'][0][0] == ('fidelity', 'Z1', 'XYZ', '2027-01-15', 90.0, 'LP')